@@ -0,0 +1,295 @@
+# api_client.py
+# Pooled HTTP client for the CURA backend.
+#
+# Every Streamlit session gets its own keep-alive requests.Session, keyed by
+# its backend sessionid, so reruns reuse warm TLS connections instead of
+# opening a new one per call. All sessions share a bounded number of
+# in-flight requests and the number of live sessions is capped (LRU).
+# Reads of the cacheable endpoints go through read_cache; mutations
+# invalidate the reads they affect. prefetch() warms those reads
+# concurrently, and a GET that misses the cache joins a prefetch already
+# in flight for the same data instead of issuing its own request. Expired
+# or invalidated reads are revalidated with conditional requests against
+# the last body kept in response_store, which also persists it on disk
+# (disk_cache) per user. Pages that pass stale_ok=True get that saved copy
+# immediately while a fresh one loads in the background, and keep getting
+# it while the backend is unreachable. Every request's latency, status and
+# size is recorded in metrics, and its outcome feeds the backend liveness
+# tracker (see liveness.py), which refuses requests while the backend is
+# waking up. GETs can optionally be hedged: a duplicate goes out if the
+# first is slower than HEDGE_AFTER.
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, as_completed
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import metrics
+from liveness import UNAVAILABLE_STATUSES, Liveness
+from read_cache import CACHEABLE_PATHS, cache, stale_reads
+from disk_cache import disk
+from response_store import responses
+
+# --- CONFIGURATION (overridable through the environment) ---
+# Point CURA_BASE_URL at mock_backend.py for local runs and benchmarks
+BASE_URL = os.environ.get('CURA_BASE_URL', "https://cura-backend-main-99c8.onrender.com/api").rstrip('/')
+CONNECT_TIMEOUT = float(os.environ.get('CURA_CONNECT_TIMEOUT', 5))
+READ_TIMEOUT = float(os.environ.get('CURA_READ_TIMEOUT', 60))
+GET_RETRIES = int(os.environ.get('CURA_GET_RETRIES', 3))
+RETRY_BACKOFF = float(os.environ.get('CURA_RETRY_BACKOFF', 0.5))
+POOL_SIZE = int(os.environ.get('CURA_POOL_SIZE', 4))              # connections kept per session
+MAX_CONNECTIONS = int(os.environ.get('CURA_MAX_CONNECTIONS', 64))  # in-flight requests, all sessions
+MAX_SESSIONS = int(os.environ.get('CURA_MAX_SESSIONS', 256))       # live pooled sessions
+PREFETCH_WORKERS = int(os.environ.get('CURA_PREFETCH_WORKERS', 16))
+HEDGE_AFTER = float(os.environ.get('CURA_HEDGE_AFTER', 0))         # seconds; 0 disables hedged GETs
+
+
+class ApiClient:
+    """Keep-alive connection pool for a single backend session."""
+
+    def __init__(self, sessionid=None, owner=None):
+        self.sessionid = sessionid
+        self.owner = owner    # disk cache key of the logged-in user, see owner_key()
+        self._http = requests.Session()
+        # Never persist cookies on the pooled session: the login response
+        # carries a sessionid that must only reach the Streamlit session
+        # that asked for it.
+        self._http.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        retry = Retry(
+            total=GET_RETRIES,
+            backoff_factor=RETRY_BACKOFF,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({'GET'}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=retry)
+        self._http.mount('https://', adapter)
+        self._http.mount('http://', adapter)
+
+    def auth_headers(self):
+        if self.sessionid:
+            return {'Cookie': f"sessionid={self.sessionid}"}
+        return {}
+
+    def request(self, method, path, **kwargs):
+        backend.check()
+        headers = self.auth_headers()
+        headers.update(kwargs.pop('headers', None) or {})
+        kwargs.setdefault('timeout', (CONNECT_TIMEOUT, READ_TIMEOUT))
+        if method == 'GET' and HEDGE_AFTER > 0 and not kwargs.get('stream'):
+            return self._hedged(path, headers, kwargs)
+        return self._send(method, path, headers, kwargs)
+
+    def _hedged(self, path, headers, kwargs):
+        # GETs are idempotent, so a slow one can be raced by a duplicate;
+        # the first successful response wins and the other is discarded
+        first = _hedge_pool.submit(self._send, 'GET', path, headers, kwargs)
+        try:
+            return first.result(timeout=HEDGE_AFTER)
+        except FutureTimeout:
+            pass
+        metrics.registry.inc('cura_backend_hedges_total', endpoint=metrics.endpoint_label(path))
+        second = _hedge_pool.submit(self._send, 'GET', path, headers, kwargs)
+        error = None
+        for future in as_completed((first, second)):
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+        raise error
+
+    def _send(self, method, path, headers, kwargs):
+        with _request_slots:
+            started = time.perf_counter()
+            try:
+                response = self._http.request(method, f"{BASE_URL}{path}", headers=headers, **kwargs)
+            except requests.exceptions.RequestException as exc:
+                metrics.observe_backend(method, path, type(exc).__name__, time.perf_counter() - started, 0)
+                if isinstance(exc, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+                    backend.record(False)
+                raise
+        backend.record(response.status_code not in UNAVAILABLE_STATUSES)
+        if kwargs.get('stream'):
+            nbytes = int(response.headers.get('Content-Length') or 0)
+        else:
+            nbytes = len(response.content)
+        metrics.observe_backend(method, path, response.status_code, time.perf_counter() - started, nbytes)
+        return response
+
+    def get(self, path, fresh=False, stale_ok=False, **kwargs):
+        """GET `path`; cacheable reads may come from the read cache.
+
+        With stale_ok, a saved copy (possibly from disk) is returned at once
+        when nothing fresh is cached, and a refresh starts in the background;
+        it is also returned instead of raising when the backend is
+        unreachable. is_fresh() tells the two apart.
+        """
+        if path not in CACHEABLE_PATHS:
+            return self.request('GET', path, **kwargs)
+        if not fresh:
+            cached = cache.get(self.sessionid, path)
+            if cached is not None:
+                return cached
+        stored = responses.get(self.sessionid, path, self.owner)
+        if not fresh:
+            if stale_ok and stored is not None and not responses.is_dirty(self.sessionid, path):
+                metrics.registry.inc('cura_stale_reads_total', reason='refreshing')
+                prefetch(self, (path,))
+                return stored
+            pending = _prefetches.get((self.sessionid, path))
+            try:
+                if pending is not None:
+                    return pending.result()
+                return self._fetch(path, stored, **kwargs)
+            except requests.exceptions.RequestException:
+                if not stale_ok or stored is None:
+                    raise
+                metrics.registry.inc('cura_stale_reads_total', reason='offline')
+                return stored
+        return self._fetch(path, stored, **kwargs)
+
+    def _fetch(self, path, stored, **kwargs):
+        generation = cache.generation(self.sessionid)
+        if stored is not None:
+            kwargs['headers'] = {**stored.conditional_headers(), **(kwargs.get('headers') or {})}
+        response = self.request('GET', path, **kwargs)
+        if response.status_code == 304 and stored is not None:
+            response = responses.not_modified(self.sessionid, path, stored, self.owner)
+        elif response.status_code == 200:
+            response = responses.put(self.sessionid, path, response, self.owner)
+        # 404 is meaningful here ("no profile/plan yet"), so it is cached too
+        if response.status_code in (200, 404):
+            cache.put(self.sessionid, path, response, generation)
+        return response
+
+    def is_fresh(self, path):
+        """Whether the read cache holds a copy of `path` confirmed by the server."""
+        return cache.has(self.sessionid, path)
+
+    def post(self, path, **kwargs):
+        return self._mutate('POST', path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self._mutate('DELETE', path, **kwargs)
+
+    def _mutate(self, method, path, **kwargs):
+        try:
+            return self.request(method, path, **kwargs)
+        finally:
+            # Invalidate even on failure: the backend may have applied it
+            self.invalidate(path)
+
+    def invalidate(self, path):
+        """Drop cached reads that a POST/DELETE to `path` can change."""
+        cache.invalidate_mutation(self.sessionid, path)
+        responses.invalidate(self.sessionid, stale_reads(path))
+
+    def close(self):
+        self._http.close()
+
+
+backend = Liveness(lambda: BASE_URL)
+_request_slots = threading.BoundedSemaphore(MAX_CONNECTIONS)
+_hedge_pool = ThreadPoolExecutor(max_workers=MAX_CONNECTIONS, thread_name_prefix='cura-hedge')
+_clients = OrderedDict()
+_clients_lock = threading.Lock()
+_prefetch_pool = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix='cura-prefetch')
+_prefetches = {}
+_prefetches_lock = threading.Lock()
+
+
+def owner_key(email):
+    """Stable, non-reversible disk cache key for the user logged in as `email`.
+
+    The email is hashed exactly as typed (bar surrounding spaces): the
+    backend may treat addresses differing in case as separate accounts.
+    """
+    if not email:
+        return None
+    return hashlib.sha256(email.strip().encode()).hexdigest()
+
+
+def get_client(sessionid=None, email=None):
+    """Return the pooled client for `sessionid`, creating it if needed.
+
+    `email` (the login of a signed-in session) enables the disk cache.
+    """
+    with _clients_lock:
+        client = _clients.pop(sessionid, None) or ApiClient(sessionid)
+        if sessionid is not None and client.owner is None:
+            client.owner = owner_key(email)
+        _clients[sessionid] = client
+        while len(_clients) > MAX_SESSIONS:
+            _, evicted = _clients.popitem(last=False)
+            evicted.close()
+    return client
+
+
+def release_client(sessionid):
+    """Drop and close the pooled client for `sessionid` (e.g. on logout)."""
+    with _clients_lock:
+        client = _clients.pop(sessionid, None)
+    cache.clear_user(sessionid)
+    responses.clear_user(sessionid)
+    if client is not None:
+        client.close()
+
+
+def prefetch(client, paths=CACHEABLE_PATHS):
+    """Fetch `paths` concurrently into the read cache without blocking."""
+    for path in paths:
+        key = (client.sessionid, path)
+        with _prefetches_lock:
+            if key in _prefetches or cache.has(*key):
+                continue
+            future = _prefetches[key] = _prefetch_pool.submit(client.get, path, fresh=True)
+        future.add_done_callback(lambda _, key=key: _forget_prefetch(key))
+
+
+def _forget_prefetch(key):
+    with _prefetches_lock:
+        _prefetches.pop(key, None)
+
+
+# --- METRICS ---
+metrics.registry.counter('cura_backend_hedges_total', "Hedged duplicate GETs sent by endpoint.")
+metrics.registry.gauge('cura_backend_state', "1 for the backend's current liveness state.")
+metrics.registry.gauge('cura_api_sessions', "Pooled backend sessions held by this process.")
+metrics.registry.gauge('cura_read_cache_entries', "Entries in the read cache.")
+metrics.registry.counter('cura_read_cache_lookups_total', "Read cache lookups by result.")
+metrics.registry.counter('cura_read_cache_evictions_total', "Read cache entries evicted for space.")
+metrics.registry.counter('cura_read_cache_invalidations_total', "Read cache entries dropped by mutations.")
+metrics.registry.gauge('cura_body_store_bytes', "Response bodies kept for revalidation.")
+metrics.registry.counter('cura_body_store_reuses_total', "Stored bodies reused instead of parsed again.")
+metrics.registry.counter('cura_stale_reads_total', "Saved copies served while refreshing or offline.")
+metrics.registry.counter('cura_disk_cache_lookups_total', "On-disk cache lookups by this process by result.")
+
+
+def _collect_metrics(registry):
+    stats = cache.stats()
+    registry.set('cura_api_sessions', len(_clients))
+    current = backend.state()
+    for state in ('up', 'unknown', 'waking'):
+        registry.set('cura_backend_state', int(state == current), state=state)
+    registry.set('cura_read_cache_entries', stats['entries'])
+    registry.set('cura_read_cache_lookups_total', stats['hits'], result='hit')
+    registry.set('cura_read_cache_lookups_total', stats['misses'], result='miss')
+    registry.set('cura_read_cache_evictions_total', stats['evictions'])
+    registry.set('cura_read_cache_invalidations_total', stats['invalidations'])
+    stats = responses.stats()
+    registry.set('cura_body_store_bytes', stats['bytes'])
+    registry.set('cura_body_store_reuses_total', stats['revalidated'], kind='not_modified')
+    registry.set('cura_body_store_reuses_total', stats['unchanged'], kind='same_content')
+    if disk is not None:
+        stats = disk.stats()
+        for result in ('hits', 'misses', 'errors'):
+            registry.set('cura_disk_cache_lookups_total', stats[result], result=result)
+
+
+metrics.add_collector(_collect_metrics)
@@ -1,7 +1,18 @@
 # app.py
+import os
+import time
+from collections import deque
+
 import streamlit as st
 import requests
 
+import api_client
+import jobs
+import metrics
+from medicine_store import MedicineStore
+from read_cache import cache
+from response_store import responses
+
 # --- PAGE CONFIG (MUST BE THE FIRST STREAMLIT COMMAND) ---
 st.set_page_config(
     page_title="CURA Health Agents",
@@ -9,24 +20,40 @@ st.set_page_config(
     layout="wide"
 )
 
-# --- STATE MANAGEMENT & API SETUP ---
-BASE_URL = "https://cura-backend-main-99c8.onrender.com/api"
+# Reminders this many minutes either side of now are preselected as "due now"
+DUE_WINDOW_MINUTES = int(os.environ.get('CURA_DUE_WINDOW_MINUTES', 60))
+
+# Long lists are paginated; navigation history keeps only the latest pages
+MEDICINES_PER_PAGE = int(os.environ.get('CURA_MEDICINES_PER_PAGE', 10))
+GROCERY_PER_PAGE = int(os.environ.get('CURA_GROCERY_PER_PAGE', 30))
+HISTORY_LIMIT = int(os.environ.get('CURA_HISTORY_LIMIT', 20))
 
+# Login emails that see the performance debug overlay (comma-separated); the
+# display name is not used, since anyone can pick it at signup
+ADMIN_EMAILS = {email.strip() for email in os.environ.get('CURA_ADMIN_EMAILS', '').split(',') if email.strip()}
+
+# --- STATE MANAGEMENT ---
 # Initialize session state variables
 if 'sessionid' not in st.session_state:
     st.session_state['sessionid'] = None
 if 'page' not in st.session_state:
     st.session_state['page'] = 'Home'
 if 'history' not in st.session_state:
-    st.session_state['history'] = []
+    st.session_state['history'] = deque(maxlen=HISTORY_LIMIT)
 if 'username' not in st.session_state:
     st.session_state['username'] = 'User'
+if 'email' not in st.session_state:
+    st.session_state['email'] = None
+if 'plan_job' not in st.session_state:
+    st.session_state['plan_job'] = None
+if 'medicine_store' not in st.session_state:
+    st.session_state['medicine_store'] = MedicineStore()
 
 # --- UTILITY FUNCTIONS ---
-def get_auth_headers():
-    if st.session_state.get('sessionid'):
-        return {'Cookie': f"sessionid={st.session_state['sessionid']}"}
-    return {}
+def get_api():
+    # Pooled, keep-alive client bound to this session's backend cookie; the
+    # login email keys this user's saved copies in the disk cache
+    return api_client.get_client(st.session_state.get('sessionid'), st.session_state.get('email'))
 
 def set_page(page_name):
     if st.session_state['page'] != page_name:
@@ -39,35 +66,88 @@ def go_back():
         st.session_state['page'] = st.session_state['history'].pop()
         st.rerun()
 
+def paginate(items, key, per_page):
+    # Returns the page of `items` picked with a page selector, shown only
+    # when there is more than one page
+    pages = max(1, -(-len(items) // per_page))
+    if pages == 1:
+        return items
+    if st.session_state.get(key, 1) > pages:
+        st.session_state[key] = pages
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, step=1, key=key)
+    return items[(page - 1) * per_page:page * per_page]
+
+@st.fragment(run_every=2)
+def render_waking_notice():
+    # Stays up while the backend boots, then reloads the page
+    if api_client.backend.state() == 'waking':
+        st.info("⏳ The CURA server is waking up after a quiet period. This usually takes under a minute; "
+                "the page will reload as soon as it is ready.")
+    else:
+        st.rerun()
+
+def show_connection_error():
+    if api_client.backend.state() == 'waking':
+        render_waking_notice()
+    else:
+        st.error("Could not connect to the API.")
+
+@st.fragment(run_every=3)
+def render_refresh_watch(path):
+    # Keeps retrying the background refresh and redraws the page once a
+    # fresh copy of `path` has replaced the saved one
+    api = get_api()
+    if api.is_fresh(path):
+        st.rerun()
+    api_client.prefetch(api, (path,))
+
+def show_saved_copy_notice(api, path, response):
+    # Shown while a page is rendered from a saved (possibly on-disk) copy
+    if api.is_fresh(path):
+        return
+    saved = time.strftime('%d %b %H:%M', time.localtime(getattr(response, 'stored_at', time.time())))
+    if api_client.backend.state() == 'up':
+        st.caption(f"🔄 Showing your saved copy from {saved} while the latest loads...")
+    else:
+        st.warning(f"📴 The CURA server can't be reached right now. Showing your saved copy from {saved}.")
+    render_refresh_watch(path)
+
 # --- HEADER & GLOBAL NAVIGATION (Updated for Vertical Layout) ---
 # The elements are now stacked vertically instead of in columns.
+def render_header():
+    # Show back button on all pages except Home
+    if st.session_state['page'] != 'Home' and st.session_state['history']:
+        if st.button("⬅️ Back"):
+            go_back()
 
-# Show back button on all pages except Home
-if st.session_state['page'] != 'Home' and st.session_state['history']:
-    if st.button("⬅️ Back"):
-        go_back()
+    st.title("CURA Health Agents")
 
-st.title("CURA Health Agents")
-
-# Show Welcome/Logout button if logged in
-if st.session_state.get('sessionid'):
-    st.write(f"Welcome, **{st.session_state.username}**!")
-    if st.button("Log Out"):
-        st.session_state['sessionid'] = None
-        st.session_state['username'] = None
-        st.session_state['history'] = []
-        set_page('Home')
+    # Show Welcome/Logout button if logged in
+    if st.session_state.get('sessionid'):
+        st.write(f"Welcome, **{st.session_state.username}**!")
+        if st.button("Log Out"):
+            api_client.release_client(st.session_state['sessionid'])
+            st.session_state['sessionid'] = None
+            st.session_state['username'] = None
+            st.session_state['email'] = None
+            st.session_state['history'] = deque(maxlen=HISTORY_LIMIT)
+            st.session_state['plan_job'] = None
+            st.session_state['medicine_store'] = MedicineStore()
+            set_page('Home')
 
-st.divider()
+    st.divider()
 
 
 # --- PAGE RENDERING LOGIC ---
 
 # --- Home Page (Updated UI) ---
-if st.session_state['page'] == "Home":
+def render_home():
     
     # --- LOGGED-IN VIEW (DASHBOARD) ---
     if st.session_state.get('sessionid'):
+        # Profile, plan and medicines load concurrently into the read cache;
+        # the buttons below (and the next page) read from it
+        api_client.prefetch(get_api())
         st.header(f"Welcome to your Dashboard, {st.session_state.username}!")
         st.markdown("Select a health agent below to manage your health.")
 
@@ -85,9 +165,8 @@ if st.session_state['page'] == "Home":
                 st.subheader("🥗 Personalized Diet Plan")
                 st.markdown("Get a daily, AI-generated diet plan tailored to your health profile and goals.")
                 if st.button("Go to Diet Plan", use_container_width=True, type="primary"):
-                    headers = get_auth_headers()
                     try:
-                        profile_response = requests.get(f"{BASE_URL}/diet/profile/", headers=headers)
+                        profile_response = get_api().get("/diet/profile/", stale_ok=True)
                         if profile_response.status_code == 404:
                             st.info("Let's set up your health profile first!")
                             set_page('Profile')
@@ -96,28 +175,15 @@ if st.session_state['page'] == "Home":
                         else:
                             st.error("Could not verify your profile.")
                     except requests.exceptions.RequestException:
-                        st.error("Could not connect to the API.")
+                        show_connection_error()
 
     # --- LOGGED-OUT VIEW (LANDING PAGE) ---
     else:
-        # --- PWA SETTINGS (Moved here to only show on the landing page) ---
-        PWA_HTML = """
-            <link rel="manifest" href="/app/static/manifest.json">
-            <meta name="theme-color" content="#4A90E2">
-            <script>
-                if ('serviceWorker' in navigator) {
-                    window.addEventListener('load', function() {
-                        navigator.serviceWorker.register('/app/static/service-worker.js').then(function(registration) {
-                            console.log('ServiceWorker registration successful with scope: ', registration.scope);
-                        }, function(err) {
-                            console.log('ServiceWorker registration failed: ', err);
-                        });
-                    });
-                }
-            </script>
-        """
-        st.markdown(PWA_HTML, unsafe_allow_html=True)
-        
+        # The backend sleeps when idle; start waking it before the user logs in
+        api_client.backend.warm_up()
+
+        # The PWA manifest and service worker are added to the page by server.py
+
         st.header("Your Personal Health Companion")
         st.markdown("#### Manage your medications and get personalized diet plans all in one place.")
         
@@ -187,6 +253,7 @@ if st.session_state['page'] == "Home":
 
 # --- Login / Sign Up / Profile Pages (Centered Forms) ---
 def render_centered_form(page_type):
+    api_client.backend.warm_up()
     st.header(f"{page_type}")
     _, center_col, _ = st.columns([1, 1.5, 1])
     with center_col:
@@ -196,9 +263,12 @@ def render_centered_form(page_type):
                 password = st.text_input("Password", type="password", key="login_password")
                 if st.button("Log In", use_container_width=True, type="primary"):
                     try:
-                        response = requests.post(f"{BASE_URL}/auth/login/", json={"email": email, "password": password})
+                        response = get_api().post("/auth/login/", json={"email": email, "password": password})
                         if response.status_code == 200:
                             st.session_state['sessionid'] = response.cookies.get('sessionid')
+                            st.session_state['email'] = email
+                            # Warm the dashboard's reads while the page switches
+                            api_client.prefetch(get_api())
                             login_data = response.json()
                             message = login_data.get('message', '')
                             try:
@@ -211,7 +281,7 @@ def render_centered_form(page_type):
                         else:
                             st.error("Invalid credentials.")
                     except requests.exceptions.RequestException:
-                        st.error("Could not connect to the API.")
+                        show_connection_error()
                 st.divider()
                 st.markdown("Need an account?")
                 if st.button("Go to Sign Up", use_container_width=True):
@@ -224,23 +294,23 @@ def render_centered_form(page_type):
                 if st.button("Create Account", use_container_width=True, type="primary"):
                     signup_data = {"username": username, "email": email, "password": password}
                     try:
-                        response = requests.post(f"{BASE_URL}/auth/signup/", json=signup_data)
+                        response = get_api().post("/auth/signup/", json=signup_data)
                         if response.status_code == 201:
                             st.success("User created successfully. Please log in.")
                             set_page('Login')
                         else:
                             st.error(f"Error: {response.json().get('error', 'Unknown error')}")
                     except requests.exceptions.RequestException:
-                        st.error("Could not connect to the API.")
+                        show_connection_error()
                 st.divider()
                 st.markdown("Already have an account?")
                 if st.button("Go to Log In", use_container_width=True):
                     set_page('Login')
 
             elif page_type == 'Health Profile':
-                headers = get_auth_headers()
+                api = get_api()
                 try:
-                    response = requests.get(f"{BASE_URL}/diet/profile/", headers=headers)
+                    response = api.get("/diet/profile/")
                     profile_data = {}
                     if response.status_code == 200:
                         profile_data = response.json()
@@ -269,27 +339,199 @@ def render_centered_form(page_type):
                         if st.form_submit_button("Save Profile", use_container_width=True, type="primary"):
                             payload = {"age": age, "weight_kg": weight_kg, "height_cm": height_cm, "activity_level": activity_level, 
                                        "dietary_preferences": dietary_preferences, "allergies": allergies, "health_issues": health_issues}
-                            response = requests.post(f"{BASE_URL}/diet/profile/", json=payload, headers=headers)
+                            response = api.post("/diet/profile/", json=payload)
                             if response.status_code in [200, 201]:
                                 st.success("Profile saved successfully!")
                                 set_page('Diet Plan')
                             else:
                                 st.error(f"Failed to save profile: {response.json().get('error', 'Unknown error')}")
                 except requests.exceptions.RequestException:
-                    st.error("Could not connect to the API.")
+                    show_connection_error()
+
 
+# --- Diet Plan Generation (Background Job) ---
+def start_plan_generation():
+    # Joins the in-flight job if one is already running for this user
+    st.session_state['plan_job'] = jobs.generate_plan(get_api())
+    st.rerun()
+
+@st.fragment(run_every=1)
+def render_plan_job_status():
+    # Polls the job without rerunning the rest of the page; the page
+    # switches to the stream view once the first piece of a plan arrives
+    job = st.session_state.get('plan_job')
+    if job is None:
+        return
+    if not job.done() and not is_streaming(job):
+        st.info(f"⏳ Creating your personalized plan... ({job.elapsed():.0f}s)")
+    else:
+        st.rerun()
+
+def is_streaming(job):
+    # Once a streamed plan has content it is drawn by render_plan_stream in
+    # place of the page; until then the previous plan stays up
+    return job is not None and job.progress is not None and job.progress.first_content_at is not None
+
+@st.fragment(run_every=0.5)
+def render_plan_stream():
+    # Draws each piece of the plan as it arrives; the page takes over once
+    # the job ends
+    job = st.session_state.get('plan_job')
+    if job is None or job.done() or not is_streaming(job):
+        st.rerun()
+    st.info(f"⏳ Creating your personalized plan... ({job.elapsed():.0f}s)")
+    plan = job.progress.snapshot()
+    if 'macronutrients' in plan:
+        render_plan_summary(plan)
+        st.divider()
+    if plan.get('meals') or plan.get('grocery_list'):
+        col1, col2 = st.columns([3, 2])
+        with col1:
+            st.subheader("🍽️ Your Meals for the Day")
+            render_meals(plan.get('meals', {}))
+        with col2:
+            st.subheader("🛒 Grocery List")
+            render_grocery_list(plan.get('grocery_list', []))
+
+
+# --- Diet Plan Sections (shared by the page and the stream) ---
+def render_plan_summary(plan):
+    macros = plan.get('macronutrients', {})
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Total Calories", plan.get('daily_calories', 'N/A'))
+    m2.metric("Protein", f"{macros.get('protein_grams', 'N/A')}g")
+    m3.metric("Carbs", f"{macros.get('carbs_grams', 'N/A')}g")
+    m4.metric("Fat", f"{macros.get('fat_grams', 'N/A')}g")
+
+    st.info(f"**💡 Note from CURA:** {plan.get('notes', 'Enjoy your healthy meals!')}")
+
+def render_meals(meals):
+    for meal_name, details in meals.items():
+        with st.container(border=True):
+            st.subheader(f"{meal_name.capitalize()}: {details.get('name', 'N/A')}")
+            c1, c2 = st.columns(2)
+            c1.caption(f"🕒 Suggested Time: {details.get('time', 'N/A')}")
+            c2.caption(f"🔥 Calories: ~{details.get('calories', 'N/A')}")
+            if details.get('notes'):
+                st.write(f"*{details.get('notes')}*")
+
+def render_grocery_list(grocery_list):
+    # One markdown element per page of items rather than one per item
+    with st.container(border=True):
+        items = paginate(grocery_list, "grocery_page", GROCERY_PER_PAGE)
+        st.markdown("\n".join(f"- {item}" for item in items) or "_Nothing to buy._")
+
+
+# --- Medicine Cards (Fragment-Scoped, Optimistic) ---
+# Card callbacks update the medicine store locally and send the change in
+# the background; the card redraws immediately from the store.
+def delete_medicine(med_id):
+    st.session_state['medicine_store'].delete_medicine(get_api(), med_id)
+
+def take_dose(med_id, rem_id):
+    st.session_state['medicine_store'].take_dose(get_api(), med_id, rem_id)
+
+def add_reminder():
+    # One reminder per comma-separated time, sent as a single batch
+    med_id = st.session_state["rem_med"]
+    times = [t.strip() for t in st.session_state["rem_time"].split(',') if t.strip()]
+    reminders = [{"time": t,
+                  "quantity": st.session_state["rem_qty"],
+                  "instruction": st.session_state["rem_inst"]} for t in times]
+    if med_id is not None:
+        st.session_state['medicine_store'].add_reminders(get_api(), med_id, reminders)
+
+def take_selected(med_ids, key):
+    # med_ids: rem_id -> med_id for the options shown
+    doses = [(med_ids[rem_id], rem_id) for rem_id in st.session_state[key] if rem_id in med_ids]
+    st.session_state['medicine_store'].take_doses(get_api(), doses)
+    # A new widget key starts the next selection from the due-now defaults
+    st.session_state['take_round'] = st.session_state.get('take_round', 0) + 1
+
+def is_due(rem_time, now):
+    try:
+        hours, minutes = (int(part) for part in rem_time.split(':'))
+    except (AttributeError, ValueError):
+        return False
+    delta = abs((hours * 60 + minutes) - (now.tm_hour * 60 + now.tm_min))
+    return min(delta, 24 * 60 - delta) <= DUE_WINDOW_MINUTES
+
+def render_take_doses(store):
+    # Several doses marked as taken with one batched request
+    now = time.localtime()
+    labels, med_ids, due = {}, {}, []
+    for med_id, med in store.medicines.items():
+        for rem in med.get('reminders', []):
+            if rem.get('pending'):
+                continue
+            rem_id = rem.get('id')
+            labels[rem_id] = f"{med.get('name', 'N/A')} - {rem.get('time', 'N/A')} ({rem.get('quantity', 0)} unit(s))"
+            med_ids[rem_id] = med_id
+            if is_due(rem.get('time'), now):
+                due.append(rem_id)
+    if not labels:
+        return
+    key = f"take_selection_{st.session_state.get('take_round', 0)}"
+    with st.expander("✅ Take Doses", expanded=bool(due)):
+        st.multiselect("Doses to mark as taken (due now are preselected)", list(labels), default=due,
+                       format_func=labels.get, key=key)
+        st.button("Mark Selected as Taken", type="primary", on_click=take_selected, args=(med_ids, key),
+                  disabled=not st.session_state.get(key))
+
+def render_add_reminders(store):
+    # One form for every medicine instead of one per card
+    names = {med_id: f"{med.get('name', 'N/A')} - {med.get('dosage', 'N/A')}" for med_id, med in store.medicines.items()}
+    if not names:
+        return
+    with st.expander("⏰ Add Reminders"):
+        with st.form("add_reminders_form"):
+            st.selectbox("Medicine", list(names), format_func=names.get, key="rem_med")
+            st.text_input("Time(s) (HH:MM, comma-separated)", key="rem_time")
+            st.number_input("Quantity", 1, 10, 1, key="rem_qty")
+            st.selectbox("Instruction", ["After Food", "Before Food", "With Food", "Any Time"], key="rem_inst")
+            st.form_submit_button("Set Reminders", on_click=add_reminder)
+
+@st.fragment(run_every=2)
+def sync_medicines():
+    # Reconciles background mutations; redraws the page only if the server
+    # disagreed with an optimistic change (or rejected it)
+    if st.session_state['medicine_store'].settle():
+        st.rerun()
+
+@st.fragment
+def render_medicine_card(med_id):
+    store = st.session_state['medicine_store']
+    med = store.medicines.get(med_id)
+    if med is None:
+        return
+    with st.container(border=True):
+        error = store.errors.pop(med_id, None)
+        if error:
+            st.error(error)
+        # Title, inventory and the reminders heading share one element
+        reminders = med.get('reminders', [])
+        c1, c2 = st.columns([6, 2])
+        c1.markdown(f"### {med.get('name', 'N/A')} - {med.get('dosage', 'N/A')}\n"
+                    f"📦 Inventory: **{med.get('inventory', 0)} units**\n\n##### ⏰ Reminders"
+                    + ("" if reminders else "\n\n_No reminders set for this medicine._"))
+        c2.button("Delete Medicine", key=f"del_med_{med_id}", use_container_width=True,
+                  on_click=delete_medicine, args=(med_id,))
+
+        for rem in reminders:
+            rem_id = rem.get('id')
+            rc1, rc2 = st.columns([4, 2])
+            with rc1:
+                st.markdown(f"**{rem.get('time', 'N/A')}:** Take {rem.get('quantity', 0)} unit(s) - *{rem.get('instruction', 'N/A')}*"
+                            + (" _(saving...)_" if rem.get('pending') else ""))
+            with rc2:
+                st.button("Mark as Taken", key=f"take_{rem_id}", use_container_width=True,
+                          on_click=take_dose, args=(med_id, rem_id), disabled=bool(rem.get('pending')))
 
-if st.session_state['page'] == "Login":
-    render_centered_form('Log In')
-elif st.session_state['page'] == "Sign Up":
-    render_centered_form('Sign Up')
-elif st.session_state['page'] == "Profile":
-    render_centered_form('Health Profile')
 
 # --- Reminders Page ---
-elif st.session_state['page'] == "Reminders":
+def render_reminders():
     st.header("💊 Medication Reminders")
-    headers = get_auth_headers()
+    api = get_api()
     
     with st.expander("➕ Add New Medicine"):
         with st.form("add_medicine_form"):
@@ -298,118 +540,128 @@ elif st.session_state['page'] == "Reminders":
             med_inventory = st.number_input("Initial Inventory", min_value=0, value=0)
             if st.form_submit_button("Add Medicine", type="primary"):
                 med_data = {"name": med_name, "dosage": med_dosage, "inventory": med_inventory}
-                response = requests.post(f"{BASE_URL}/reminder/medicines/", json=med_data, headers=headers)
-                if response.status_code == 201:
-                    st.success("Medicine added!")
-                    st.rerun()
-                else:
-                    st.error(f"Error: {response.json().get('error', 'Could not add medicine.')}")
+                try:
+                    response = api.post("/reminder/medicines/", json=med_data)
+                    if response.status_code == 201:
+                        st.success("Medicine added!")
+                        st.rerun()
+                    else:
+                        st.error(f"Error: {response.json().get('error', 'Could not add medicine.')}")
+                except requests.exceptions.RequestException:
+                    show_connection_error()
 
     st.divider()
     st.subheader("Your Medicines")
     
     try:
-        response = requests.get(f"{BASE_URL}/reminder/medicines/", headers=headers)
+        # Renders at once from the saved copy, if any, while it refreshes
+        response = api.get("/reminder/medicines/", stale_ok=True)
         if response.status_code == 200:
+            show_saved_copy_notice(api, "/reminder/medicines/", response)
             medicines = response.json()
             if not medicines:
                 st.info("You haven't added any medicines yet.")
             
-            for med in medicines:
-                med_id = med.get('id')
-                with st.container(border=True):
-                    c1, c2, c3 = st.columns([4, 2, 2])
-                    with c1:
-                        st.subheader(f"{med.get('name', 'N/A')} - {med.get('dosage', 'N/A')}")
-                    with c2:
-                        st.metric("Inventory", f"{med.get('inventory', 0)} units")
-                    with c3:
-                        st.write("") 
-                        if st.button("Delete Medicine", key=f"del_med_{med_id}", use_container_width=True):
-                            requests.delete(f"{BASE_URL}/reminder/medicines/{med_id}/", headers=headers)
-                            st.rerun()
-                    
-                    st.markdown("##### ⏰ Reminders")
-                    reminders = med.get('reminders', [])
-                    if not reminders:
-                        st.caption("No reminders set for this medicine.")
-                    for rem in reminders:
-                        rem_id = rem.get('id')
-                        rc1, rc2 = st.columns([4, 2])
-                        with rc1:
-                            st.markdown(f"**{rem.get('time', 'N/A')}:** Take {rem.get('quantity', 0)} unit(s) - *{rem.get('instruction', 'N/A')}*")
-                        with rc2:
-                            if st.button("Mark as Taken", key=f"take_{rem_id}", use_container_width=True):
-                                requests.post(f"{BASE_URL}/reminder/reminders/{rem_id}/take/", headers=headers)
-                                st.rerun()
-                    
-                    with st.expander("Add New Reminder"):
-                        with st.form(f"add_rem_{med_id}"):
-                            new_time = st.text_input("Time (HH:MM)")
-                            new_qty = st.number_input("Quantity", 1, 10, 1)
-                            new_inst = st.selectbox("Instruction", ["After Food", "Before Food", "With Food", "Any Time"])
-                            if st.form_submit_button("Set Reminder"):
-                                rem_data = {"time": new_time, "quantity": new_qty, "instruction": new_inst}
-                                requests.post(f"{BASE_URL}/reminder/medicines/{med_id}/reminders/", json=rem_data, headers=headers)
-                                st.rerun()
+            # Cards are fragments: their buttons rerun only that card
+            store = st.session_state['medicine_store']
+            store.settle()
+            store.load(medicines, response.version)
+            sync_medicines()
+            render_take_doses(store)
+            render_add_reminders(store)
+            for med in paginate(medicines, "medicine_page", MEDICINES_PER_PAGE):
+                render_medicine_card(med.get('id'))
     except requests.exceptions.RequestException:
-        st.error("Could not connect to the API.")
+        show_connection_error()
 
 # --- Diet Plan Page ---
-elif st.session_state['page'] == "Diet Plan":
+def render_diet_plan():
     st.header("🥗 Personalized Diet Plan")
-    headers = get_auth_headers()
+    api = get_api()
+
+    plan_job = st.session_state.get('plan_job')
+    if plan_job is not None and plan_job.done():
+        st.session_state['plan_job'] = None
+        if plan_job.error is not None:
+            st.error(f"Could not generate your plan: {plan_job.error}")
+        plan_job = None
+    generating = plan_job is not None
+    if is_streaming(plan_job):
+        render_plan_stream()
+        return
+    if generating:
+        render_plan_job_status()
     
     try:
-        plan_response = requests.get(f"{BASE_URL}/diet/plan/", headers=headers)
+        plan_response = api.get("/diet/plan/", stale_ok=True)
         
         if plan_response.status_code == 404:
-            st.info("You don't have a diet plan yet. Let's generate one!")
-            if st.button("Generate My First Diet Plan", type="primary", use_container_width=True):
-                with st.spinner("Creating your personalized plan..."):
-                    requests.post(f"{BASE_URL}/diet/plan/generate/", headers=headers)
-                    st.rerun()
+            if not generating:
+                st.info("You don't have a diet plan yet. Let's generate one!")
+            if st.button("Generate My First Diet Plan", type="primary", use_container_width=True, disabled=generating):
+                start_plan_generation()
         
         elif plan_response.status_code == 200:
+            show_saved_copy_notice(api, "/diet/plan/", plan_response)
             plan = plan_response.json()
-            macros = plan.get('macronutrients', {})
-
-            m1, m2, m3, m4 = st.columns(4)
-            m1.metric("Total Calories", plan.get('daily_calories', 'N/A'))
-            m2.metric("Protein", f"{macros.get('protein_grams', 'N/A')}g")
-            m3.metric("Carbs", f"{macros.get('carbs_grams', 'N/A')}g")
-            m4.metric("Fat", f"{macros.get('fat_grams', 'N/A')}g")
-
-            st.info(f"**💡 Note from CURA:** {plan.get('notes', 'Enjoy your healthy meals!')}")
+            render_plan_summary(plan)
             st.divider()
 
             col1, col2 = st.columns([3, 2])
             with col1:
                 st.subheader("🍽️ Your Meals for the Day")
-                meals = plan.get('meals', {})
-                for meal_name, details in meals.items():
-                    with st.container(border=True):
-                        st.subheader(f"{meal_name.capitalize()}: {details.get('name', 'N/A')}")
-                        c1, c2 = st.columns(2)
-                        c1.caption(f"🕒 Suggested Time: {details.get('time', 'N/A')}")
-                        c2.caption(f"🔥 Calories: ~{details.get('calories', 'N/A')}")
-                        if details.get('notes'):
-                            st.write(f"*{details.get('notes')}*")
+                render_meals(plan.get('meals', {}))
 
             with col2:
                 st.subheader("🛒 Grocery List")
-                with st.container(border=True):
-                    grocery_list = plan.get('grocery_list', [])
-                    for item in grocery_list:
-                        st.markdown(f"- {item}")
+                render_grocery_list(plan.get('grocery_list', []))
                 
                 st.subheader("Actions")
-                if st.button("Generate a New Plan", use_container_width=True):
-                    with st.spinner("Working on a new plan..."):
-                        requests.post(f"{BASE_URL}/diet/plan/generate/", headers=headers)
-                        st.rerun()
+                if st.button("Generate a New Plan", use_container_width=True, disabled=generating):
+                    start_plan_generation()
                 if st.button("Update Health Profile", use_container_width=True):
                     set_page('Profile')
                     
     except requests.exceptions.RequestException:
-        st.error("Could not connect to the API.")
+        show_connection_error()
+
+
+# --- Debug Overlay (Admins Only) ---
+def render_debug_overlay():
+    with st.sidebar.expander("⏱️ Performance", expanded=False):
+        reruns = list(metrics.recent_reruns)[-10:]
+        if reruns:
+            st.caption("Recent reruns on this worker")
+            st.dataframe([{"page": r['page'], "ms": round(r['seconds'] * 1000, 1), "elements": r['elements'],
+                           "KiB": round(r['bytes'] / 1024, 1), "outcome": r['outcome']}
+                          for r in reversed(reruns)], hide_index=True)
+        st.caption("Read cache")
+        st.json(cache.stats())
+        usage = metrics.session_memory(st.session_state, responses.shared())
+        total = sum(usage.values())
+        st.caption(f"Session state: {total / 1024:.1f} KiB of {metrics.SESSION_BUDGET / 1024:.0f} KiB budget")
+        if total > metrics.SESSION_BUDGET:
+            st.warning("This session is over its memory budget.")
+        st.dataframe([{"key": key, "KiB": round(size / 1024, 1)} for key, size in usage.items()], hide_index=True)
+
+
+PAGES = {
+    "Home": render_home,
+    "Login": lambda: render_centered_form('Log In'),
+    "Sign Up": lambda: render_centered_form('Sign Up'),
+    "Profile": lambda: render_centered_form('Health Profile'),
+    "Reminders": render_reminders,
+    "Diet Plan": render_diet_plan,
+}
+
+# Every rerun is timed per page, with the number of elements it sent
+with metrics.rerun_timer(st.session_state['page']):
+    render_header()
+    PAGES.get(st.session_state['page'], render_home)()
+
+# Medicines are only kept in the session while the Reminders page shows them
+if st.session_state['page'] != 'Reminders':
+    st.session_state['medicine_store'].release()
+
+if st.session_state.get('sessionid') and st.session_state.get('email') in ADMIN_EMAILS:
+    render_debug_overlay()
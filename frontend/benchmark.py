@@ -0,0 +1,307 @@
+# benchmark.py
+# Concurrent-session load and latency benchmark for the CURA frontend.
+#
+# Starts mock_backend.py, points the app at it (CURA_BASE_URL) and drives
+# simulated sessions through the real app.py script with Streamlit's AppTest
+# harness. AppTest is not thread-safe, so concurrency comes from worker
+# processes, each running its share of sessions back to back:
+#
+#   login -> dashboard -> reminders -> mark taken -> diet plan
+#
+# For every action it reports script rerun time (p50/p95/p99), backend calls
+# and elements sent to the browser (websocket deltas), plus per-session
+# memory. Example:
+#
+#   python benchmark.py --sessions 200 --concurrency 16 --latency 30 --medicines 20
+#
+# --sweep-medicines / --sweep-sessions rerun it over growing data sizes
+# (medicines per user, with 4x as many grocery items) and session counts,
+# and check that deltas per action and memory per session stay flat:
+#
+#   python benchmark.py --sweep-medicines 20,80,320 --sweep-sessions 8,32
+#
+# (pick medicine counts of at least a page, CURA_MEDICINES_PER_PAGE)
+
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+import requests
+
+import metrics
+import mock_backend
+from response_store import responses
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(APP_DIR, 'app.py')
+ACTIONS = ('landing', 'login', 'dashboard', 'reminders', 'mark_taken', 'diet_plan')
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def wait_for_background(timeout=30):
+    """Wait until no prefetch or background job is in flight in this process."""
+    # Imported here: api_client reads CURA_BASE_URL, which run_worker sets first
+    import api_client
+    import jobs
+
+    deadline = time.monotonic() + timeout
+    while (api_client._prefetches or jobs._inflight) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def rss_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return 0
+
+
+class Recorder:
+    def __init__(self):
+        self.latency = defaultdict(list)     # action -> [seconds]
+        self.calls = defaultdict(list)       # action -> [backend calls]
+        self.elements = defaultdict(list)    # action -> [elements sent]
+        self.session_bytes = []
+        self.rss_per_session = []
+        self.failures = defaultdict(int)
+
+    def record(self, action, seconds, calls, elements):
+        self.latency[action].append(seconds)
+        self.calls[action].append(calls)
+        self.elements[action].append(elements)
+
+    def merge(self, other):
+        for action in other.latency:
+            self.latency[action] += other.latency[action]
+            self.calls[action] += other.calls[action]
+            self.elements[action] += other.elements[action]
+        self.session_bytes += other.session_bytes
+        self.rss_per_session += other.rss_per_session
+        for name, count in other.failures.items():
+            self.failures[name] += count
+
+
+class SimulatedSession:
+    """One browser session driven through app.py by AppTest."""
+
+    def __init__(self, index, base_url, recorder, timeout):
+        from streamlit.testing.v1 import AppTest
+
+        self.email = f"bench-{index}-{time.time_ns()}@example.com"
+        self.base_url = base_url
+        self.stats_url = base_url.rsplit('/api', 1)[0] + '/__stats__'
+        self.recorder = recorder
+        self.at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+
+    def backend_calls(self):
+        return requests.get(self.stats_url, params={'user': self.email}, timeout=30).json()['user_calls']
+
+    def step(self, action, fn):
+        calls = self.backend_calls()
+        started_at = time.time()
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        if self.at.exception:
+            raise RuntimeError(f"{action}: {self.at.exception[0].value}")
+        # Prefetches and optimistic mutations the action started are its calls too
+        wait_for_background()
+        # AppTest runs app.py in this process, so its reruns land in metrics
+        elements = sum(r['elements'] for r in list(metrics.recent_reruns) if r['at'] >= started_at)
+        self.recorder.record(action, elapsed, self.backend_calls() - calls, elements)
+
+    def click(self, label):
+        button = next(b for b in self.at.button if b.label == label and not b.disabled)
+        button.click().run()
+
+    def run(self):
+        requests.post(f"{self.base_url}/auth/signup/",
+                      json={'username': 'bench', 'email': self.email, 'password': 'secret'}, timeout=30)
+        at = self.at
+        self.step('landing', at.run)
+
+        def login():
+            at.session_state['page'] = 'Login'
+            at.run()
+            at.text_input(key='login_email').input(self.email)
+            at.text_input(key='login_password').input('secret')
+            self.click('Log In')
+        self.step('login', login)
+        self.step('dashboard', at.run)
+        self.step('reminders', lambda: self.click('Go to Reminders'))
+        self.step('mark_taken', lambda: self.click('Mark as Taken'))
+
+        def diet_plan():
+            at.session_state['page'] = 'Home'
+            at.run()
+            self.click('Go to Diet Plan')
+        self.step('diet_plan', diet_plan)
+        state = {key: at.session_state[key] for key in at.session_state.keys()}
+        self.recorder.session_bytes.append(sum(metrics.session_memory(state, responses.shared()).values()))
+
+
+def run_worker(indices, base_url, timeout, verbose):
+    """Run sessions back to back in one process; returns its Recorder."""
+    # Must be set before app.py first imports api_client
+    os.environ['CURA_BASE_URL'] = base_url
+    recorder = Recorder()
+    rss_before = None
+    sessions = []   # kept alive so memory is measured with every session resident
+    for index in indices:
+        if sessions and rss_before is None:
+            # Measured after the first session, once imports and caches are warm
+            rss_before = rss_bytes()
+        session = SimulatedSession(index, base_url, recorder, timeout)
+        sessions.append(session)
+        try:
+            session.run()
+        except Exception as exc:
+            recorder.failures[type(exc).__name__] += 1
+            if verbose:
+                print(f"session {index} failed: {exc}", file=sys.stderr)
+    if rss_before is not None:
+        recorder.rss_per_session.append((rss_bytes() - rss_before) / (len(sessions) - 1))
+    return recorder
+
+
+def run_benchmark(args):
+    config = mock_backend.MockConfig(latency=args.latency / 1000, jitter=args.jitter / 1000,
+                                     cold_start=args.cold_start, error_rate=args.error_rate,
+                                     generate_delay=args.generate_delay, seed_medicines=args.medicines,
+                                     grocery_items=args.grocery_items)
+    backend = mock_backend.start(config=config)
+
+    recorder = Recorder()
+    shares = [range(i, args.sessions, args.concurrency) for i in range(args.concurrency)]
+    started = time.perf_counter()
+    with multiprocessing.get_context('spawn').Pool(args.concurrency) as pool:
+        jobs = [(share, backend.base_url, args.timeout, args.verbose) for share in shares if share]
+        for result in pool.starmap(run_worker, jobs):
+            recorder.merge(result)
+    wall = time.perf_counter() - started
+
+    return {
+        'sessions': args.sessions,
+        'concurrency': args.concurrency,
+        'wall_seconds': wall,
+        'sessions_per_second': args.sessions / wall if wall else 0.0,
+        'failures': dict(recorder.failures),
+        'actions': {
+            action: {
+                'count': len(recorder.latency[action]),
+                'p50_ms': percentile(recorder.latency[action], 50) * 1000,
+                'p95_ms': percentile(recorder.latency[action], 95) * 1000,
+                'p99_ms': percentile(recorder.latency[action], 99) * 1000,
+                'mean_backend_calls': statistics.fmean(recorder.calls[action]) if recorder.calls[action] else 0.0,
+                'mean_elements': statistics.fmean(recorder.elements[action]) if recorder.elements[action] else 0.0,
+            }
+            for action in ACTIONS
+        },
+        'session_state_bytes': statistics.fmean(recorder.session_bytes) if recorder.session_bytes else 0,
+        'rss_bytes_per_session': statistics.fmean(recorder.rss_per_session) if recorder.rss_per_session else 0,
+        'backend_calls': dict(backend.state.calls),
+    }
+
+
+def print_report(report):
+    print(f"{report['sessions']} sessions, concurrency {report['concurrency']}: "
+          f"{report['wall_seconds']:.1f}s ({report['sessions_per_second']:.1f} sessions/s)")
+    if report['failures']:
+        print(f"failed sessions: {report['failures']}")
+    print(f"{'action':<12} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'calls':>7} {'deltas':>7}")
+    for action, row in report['actions'].items():
+        print(f"{action:<12} {row['count']:>5} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} "
+              f"{row['p99_ms']:>9.1f} {row['mean_backend_calls']:>7.2f} {row['mean_elements']:>7.1f}")
+    print(f"session_state per session: {report['session_state_bytes'] / 1024:.1f} KiB; "
+          f"process RSS per session: {report['rss_bytes_per_session'] / 1024:.1f} KiB")
+
+
+def run_sweep(args):
+    """Run the benchmark for every (medicines, sessions) pair; returns the rows."""
+    rows = []
+    for medicines in args.sweep_medicines or [args.medicines]:
+        for sessions in args.sweep_sessions or [args.sessions]:
+            run_args = argparse.Namespace(**{**vars(args), 'medicines': medicines, 'grocery_items': 4 * medicines,
+                                             'sessions': sessions, 'concurrency': min(args.concurrency, sessions)})
+            report = run_benchmark(run_args)
+            rows.append({'medicines': medicines, 'sessions': sessions,
+                         'deltas': {action: row['mean_elements'] for action, row in report['actions'].items()},
+                         'session_state_bytes': report['session_state_bytes'],
+                         'rss_bytes_per_session': report['rss_bytes_per_session'],
+                         'failures': report['failures']})
+    return rows
+
+
+def print_sweep(rows, tolerance):
+    print(f"{'medicines':>9} {'sessions':>8} {'reminders deltas':>16} {'state KiB':>9} {'RSS KiB':>9}")
+    for row in rows:
+        print(f"{row['medicines']:>9} {row['sessions']:>8} {row['deltas']['reminders']:>16.1f} "
+              f"{row['session_state_bytes'] / 1024:>9.1f} {row['rss_bytes_per_session'] / 1024:>9.1f}")
+    flat = True
+    for name, value in (('reminders deltas', lambda r: r['deltas']['reminders']),
+                        ('session state', lambda r: r['session_state_bytes']),
+                        ('RSS per session', lambda r: r['rss_bytes_per_session'])):
+        values = [value(row) for row in rows]
+        growth = max(values) / max(min(values), 1)
+        ok = growth <= tolerance
+        flat &= ok
+        print(f"{name}: x{growth:.2f} from smallest to largest run ({'flat' if ok else 'NOT FLAT'})")
+    over = [row for row in rows if row['session_state_bytes'] > metrics.SESSION_BUDGET]
+    if over:
+        flat = False
+        print(f"{len(over)} run(s) over the {metrics.SESSION_BUDGET / 1024:.0f} KiB per-session budget")
+    return flat
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load and latency benchmark for the CURA frontend.")
+    parser.add_argument('--sessions', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=20, help="mock backend latency (ms)")
+    parser.add_argument('--jitter', type=float, default=5, help="mock backend latency jitter (ms)")
+    parser.add_argument('--cold-start', type=float, default=0, help="mock backend cold-start delay (s)")
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--generate-delay', type=float, default=0.5)
+    parser.add_argument('--medicines', type=int, default=5, help="medicines seeded per user")
+    parser.add_argument('--grocery-items', type=int, default=12, help="grocery items per generated plan")
+    parser.add_argument('--sweep-medicines', type=_int_list, help="comma-separated medicine counts to sweep")
+    parser.add_argument('--sweep-sessions', type=_int_list, help="comma-separated session counts to sweep")
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help="largest allowed growth of a swept measure before it counts as not flat")
+    parser.add_argument('--timeout', type=float, default=60, help="per-rerun timeout (s)")
+    parser.add_argument('--json', help="also write the report to this file")
+    parser.add_argument('--verbose', action='store_true')
+    return parser.parse_args(argv)
+
+
+def _int_list(value):
+    return [int(part) for part in value.split(',') if part.strip()]
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.sweep_medicines or args.sweep_sessions:
+        rows = run_sweep(args)
+        flat = print_sweep(rows, args.tolerance)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(rows, f, indent=2)
+        sys.exit(0 if flat else 1)
+    report = run_benchmark(args)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
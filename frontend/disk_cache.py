@@ -0,0 +1,170 @@
+# disk_cache.py
+# SQLite-backed store of each user's last known profile, plan and medicines.
+#
+# response_store keeps bodies in memory for one process; this keeps them on
+# disk so they survive page refreshes, new logins and worker restarts, and
+# are shared by every worker on the host. Pages use them to render straight
+# away while a fresh copy loads, and to stay readable while the backend is
+# unreachable.
+#
+# Rows are keyed by a hash of the user's login email, not the backend
+# session, so a new login finds the previous session's data. Each write is
+# one transaction (readers never see half an entry); WAL mode and a busy
+# timeout let several worker processes read and write concurrently. Total
+# size is capped, evicting least-recently-stored rows first. The cache is
+# best-effort: any SQLite error is treated as a miss.
+#
+# The file holds health data, so by default it lives in a cache directory
+# created private to the app's user (mode 0700), and a file that is a
+# symlink or belongs to another user is refused rather than written to.
+
+import os
+import sqlite3
+import stat
+import threading
+import time
+
+CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'cura')
+# Empty CURA_DISK_CACHE disables the disk cache
+PATH = os.environ.get('CURA_DISK_CACHE', os.path.join(CACHE_DIR, 'cache.sqlite3'))
+MAX_BYTES = int(os.environ.get('CURA_DISK_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+MAX_ENTRY_BYTES = int(os.environ.get('CURA_DISK_CACHE_MAX_ENTRY_BYTES', 1024 * 1024))
+MAX_AGE = float(os.environ.get('CURA_DISK_CACHE_MAX_AGE', 7 * 24 * 3600))   # seconds
+
+ERRORS = (sqlite3.Error, OSError)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bodies (
+    owner TEXT NOT NULL,
+    path TEXT NOT NULL,
+    content BLOB NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    PRIMARY KEY (owner, path)
+);
+CREATE INDEX IF NOT EXISTS bodies_stored_at ON bodies (stored_at);
+"""
+
+
+class DiskCache:
+    def __init__(self, path=PATH, max_bytes=MAX_BYTES, max_entry_bytes=MAX_ENTRY_BYTES, max_age=MAX_AGE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.max_age = max_age
+        self._local = threading.local()    # one connection per thread
+        self._ready = False
+        self._ready_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            if not self._ready:
+                with self._ready_lock:
+                    if not self._ready:
+                        _create_private(self.path)
+                        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+                        conn.execute('PRAGMA journal_mode=WAL')
+                        conn.executescript(SCHEMA)
+                        conn.close()
+                        self._ready = True
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def get(self, owner, path):
+        """Return (content, etag, last_modified, stored_at) or None."""
+        try:
+            row = self._connection().execute(
+                'SELECT content, etag, last_modified, stored_at FROM bodies WHERE owner = ? AND path = ?',
+                (owner, path)).fetchone()
+        except ERRORS:
+            self.errors += 1
+            return None
+        if row is None or time.time() - row[3] > self.max_age:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return bytes(row[0]), row[1], row[2], row[3]
+
+    def put(self, owner, path, content, etag=None, last_modified=None, stored_at=None):
+        if len(content) > self.max_entry_bytes:
+            return
+        try:
+            conn = self._connection()
+            with _transaction(conn):
+                conn.execute('INSERT OR REPLACE INTO bodies VALUES (?, ?, ?, ?, ?, ?, ?)',
+                             (owner, path, content, etag, last_modified, len(content), stored_at or time.time()))
+                self._evict(conn)
+        except ERRORS:
+            self.errors += 1
+
+    def touch(self, owner, path):
+        """Mark an entry as just confirmed by the server (a 304)."""
+        try:
+            conn = self._connection()
+            with _transaction(conn):
+                conn.execute('UPDATE bodies SET stored_at = ? WHERE owner = ? AND path = ?',
+                             (time.time(), owner, path))
+        except ERRORS:
+            self.errors += 1
+
+    def _evict(self, conn):
+        conn.execute('DELETE FROM bodies WHERE stored_at < ?', (time.time() - self.max_age,))
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM bodies').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for rowid, size in conn.execute('SELECT rowid, size FROM bodies ORDER BY stored_at').fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute('DELETE FROM bodies WHERE rowid = ?', (rowid,))
+            total -= size
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'errors': self.errors}
+
+
+def _create_private(path):
+    # Create `path` (and a missing directory) for this user only; refuse a
+    # symlink or a file someone else created in its place
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+    fd = os.open(path, os.O_CREAT | os.O_RDWR | getattr(os, 'O_NOFOLLOW', 0), 0o600)
+    try:
+        info = os.fstat(fd)
+        if not stat.S_ISREG(info.st_mode) or (hasattr(os, 'getuid') and info.st_uid != os.getuid()):
+            raise PermissionError(f"Refusing to use {path}: not a regular file owned by this user")
+        if hasattr(os, 'fchmod'):
+            os.fchmod(fd, 0o600)
+    finally:
+        os.close(fd)
+
+
+class _transaction:
+    # BEGIN IMMEDIATE takes the write lock up front, so concurrent writers
+    # from other workers wait (busy timeout) instead of failing mid-way
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            try:
+                self.conn.execute('COMMIT')
+                return False
+            except sqlite3.Error:
+                self.conn.execute('ROLLBACK')
+                raise
+        self.conn.execute('ROLLBACK')
+        return False
+
+
+disk = DiskCache() if PATH else None
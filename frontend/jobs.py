@@ -0,0 +1,86 @@
+# jobs.py
+# Background jobs for slow backend calls (e.g. diet-plan generation).
+#
+# Jobs run on a small bounded thread pool so Streamlit script threads never
+# block on them. A job is keyed by (user, kind): submitting the same key while
+# a job is still in flight returns that job instead of starting another.
+# A job can carry a `progress` object that it fills in while running (e.g.
+# a streamed diet plan), which pages read to show partial results.
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import plan_stream
+
+MAX_WORKERS = int(os.environ.get('CURA_JOB_WORKERS', 8))
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='cura-job')
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+class Job:
+    def __init__(self, key, fn, progress=None):
+        self.key = key
+        self.progress = progress
+        self.started_at = time.monotonic()
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self._future = _executor.submit(self._run, fn)
+
+    def _run(self, fn):
+        try:
+            self.result = fn()
+        except Exception as exc:
+            self.error = exc
+        finally:
+            self.finished_at = time.monotonic()
+            with _inflight_lock:
+                if _inflight.get(self.key) is self:
+                    del _inflight[self.key]
+
+    @property
+    def status(self):
+        if self.finished_at is None:
+            return 'running'
+        return 'failed' if self.error is not None else 'done'
+
+    def done(self):
+        return self.finished_at is not None
+
+    def wait(self):
+        """Block until the job has finished (successfully or not)."""
+        self._future.result()
+
+    def elapsed(self):
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+
+def submit(key, fn, progress=None):
+    """Run `fn` in the background, deduplicated by `key`."""
+    with _inflight_lock:
+        job = _inflight.get(key)
+        if job is None:
+            job = _inflight[key] = Job(key, fn, progress)
+        return job
+
+
+def generate_plan(api):
+    """Start (or join) diet-plan generation for the client's user.
+
+    When the backend can stream the plan, the job's progress is a
+    plan_stream.PartialPlan that fills in as pieces arrive.
+    """
+    if plan_stream.enabled():
+        partial = plan_stream.PartialPlan()
+        return submit((api.sessionid, 'plan'), lambda: plan_stream.generate(api, partial), partial)
+
+    def run():
+        response = api.post("/diet/plan/generate/")
+        if response.status_code not in (200, 201, 202):
+            raise RuntimeError(response.json().get('error', f"HTTP {response.status_code}"))
+        return response
+    return submit((api.sessionid, 'plan'), run)
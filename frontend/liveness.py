@@ -0,0 +1,171 @@
+# liveness.py
+# Backend liveness tracking: keep-warm pinger, cold-start detection and a
+# circuit breaker.
+#
+# The backend is hosted on a service that spins down when idle; the first
+# request afterwards blocks for as long as it takes to boot. This module
+# watches every backend response (api_client reports them) and:
+#
+# - pings the backend in the background while users are around, but only
+#   when real traffic has not already kept it warm; pings stop once nobody
+#   has used the app for KEEPWARM_IDLE so an unused deployment can sleep,
+# - starts a wake-up ping as soon as someone opens the landing or login
+#   page, so the backend boots while they type their credentials,
+# - reports the backend as "waking" while a ping after idle is slow, or
+#   after repeated connection failures (circuit open); requests then fail
+#   fast with BackendWaking instead of piling up behind the boot, and the
+#   pinger probes every few seconds until the backend answers.
+
+import os
+import threading
+import time
+
+import requests
+
+import metrics
+
+PING_PATH = os.environ.get('CURA_PING_PATH', '/')
+KEEPWARM_INTERVAL = float(os.environ.get('CURA_KEEPWARM_INTERVAL', 240))   # quiet seconds before a keep-warm ping
+KEEPWARM_IDLE = float(os.environ.get('CURA_KEEPWARM_IDLE', 1800))          # stop pinging after this long without users
+COLD_AFTER = float(os.environ.get('CURA_COLD_AFTER', 600))                 # no response for this long: may be asleep
+WAKING_AFTER = float(os.environ.get('CURA_WAKING_AFTER', 3))               # a ping after idle slower than this is a boot
+PROBE_INTERVAL = float(os.environ.get('CURA_PROBE_INTERVAL', 5))           # ping cadence while waking
+FAILURE_THRESHOLD = 3        # consecutive connection failures that open the circuit
+PING_TIMEOUT = (5, 120)      # long enough to sit through a cold boot
+
+# Statuses the hosting proxy returns while the backend is down or booting
+UNAVAILABLE_STATUSES = (502, 503, 504)
+
+
+class BackendWaking(requests.exceptions.ConnectionError):
+    """Raised instead of sending a request while the backend is waking up."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*(args or ("The CURA server is waking up. Please try again in a moment.",)), **kwargs)
+
+
+class Liveness:
+    """What this process currently knows about the backend's availability.
+
+    `base_url` is a callable returning the backend URL, read at every ping
+    so a repointed client (e.g. at mock_backend) is pinged where it now is.
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.last_ok = None          # monotonic time of the last response from the backend
+        self.last_activity = None    # last time a user did anything
+        self.failures = 0
+        self.circuit_open = False
+        self._probe_started = None   # set while a ping to a possibly-asleep backend runs
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pinger = None
+        self._http = requests.Session()
+
+    # --- STATE ---
+    def state(self):
+        """'up', 'unknown' (idle for a while, may be asleep) or 'waking'."""
+        now = time.monotonic()
+        with self._lock:
+            if self.circuit_open:
+                return 'waking'
+            if self._probe_started is not None and now - self._probe_started > WAKING_AFTER:
+                return 'waking'
+            if self.last_ok is not None and now - self.last_ok < COLD_AFTER:
+                return 'up'
+            return 'unknown'
+
+    def check(self):
+        """Raise BackendWaking if requests should not be sent right now."""
+        self.touch()
+        state = self.state()
+        if state == 'waking':
+            metrics.registry.inc('cura_backend_fast_failures_total')
+            raise BackendWaking()
+        if state == 'unknown':
+            # This request may sit through a boot; ping alongside it so the
+            # ones after it can tell and fail fast
+            self._wake.set()
+
+    def record(self, ok):
+        """Report the outcome of a backend request (False: connection failure or 502-504)."""
+        with self._lock:
+            if ok:
+                self.last_ok = time.monotonic()
+                self.failures = 0
+                self.circuit_open = False
+                return
+            self.failures += 1
+            opened = self.failures >= FAILURE_THRESHOLD and not self.circuit_open
+            if opened:
+                self.circuit_open = True
+        if opened:
+            metrics.registry.inc('cura_backend_circuit_opens_total')
+            self._ensure_pinger()
+            self._wake.set()
+
+    # --- KEEP-WARM ---
+    def touch(self):
+        self.last_activity = time.monotonic()
+        self._ensure_pinger()
+
+    def warm_up(self):
+        """Start waking the backend now unless it answered recently."""
+        self.touch()
+        with self._lock:
+            quiet = self.last_ok is None or time.monotonic() - self.last_ok > KEEPWARM_INTERVAL
+        if quiet:
+            self._wake.set()
+
+    def _ensure_pinger(self):
+        if self._pinger is not None:
+            return
+        with self._lock:
+            if self._pinger is None:
+                self._pinger = threading.Thread(target=self._ping_forever, name='cura-keepwarm', daemon=True)
+                self._pinger.start()
+
+    def _next_interval(self):
+        # Probe quickly while waking; otherwise wake up when the backend will
+        # have been quiet for KEEPWARM_INTERVAL (real traffic resets that)
+        if self.state() == 'waking':
+            return PROBE_INTERVAL
+        if self.last_ok is None:
+            return KEEPWARM_INTERVAL
+        return max(PROBE_INTERVAL, KEEPWARM_INTERVAL - (time.monotonic() - self.last_ok))
+
+    def _ping_forever(self):
+        while True:
+            forced = self._wake.wait(self._next_interval())
+            self._wake.clear()
+            now = time.monotonic()
+            if not forced and not self.circuit_open:
+                if self.last_activity is None or now - self.last_activity > KEEPWARM_IDLE:
+                    continue    # nobody is using the app: let the backend sleep
+                if self.last_ok is not None and now - self.last_ok < KEEPWARM_INTERVAL:
+                    continue    # real traffic is keeping it warm
+            self.ping()
+
+    def ping(self):
+        """Send one liveness request; any non-5xx answer means the backend is up."""
+        with self._lock:
+            cold = self.last_ok is None or time.monotonic() - self.last_ok > COLD_AFTER
+            if cold:
+                self._probe_started = time.monotonic()
+        try:
+            response = self._http.get(f"{self.base_url()}{PING_PATH}", timeout=PING_TIMEOUT)
+            ok = response.status_code not in UNAVAILABLE_STATUSES
+        except requests.exceptions.RequestException:
+            ok = False
+        finally:
+            with self._lock:
+                self._probe_started = None
+        metrics.registry.inc('cura_backend_pings_total', result='ok' if ok else 'failed')
+        self.record(ok)
+        return ok
+
+
+metrics.registry.counter('cura_backend_pings_total', "Keep-warm and wake-up pings by result.")
+metrics.registry.counter('cura_backend_circuit_opens_total', "Times repeated failures opened the circuit.")
+metrics.registry.counter('cura_backend_fast_failures_total', "Requests refused while the backend was waking.")
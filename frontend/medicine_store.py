@@ -0,0 +1,234 @@
+# medicine_store.py
+# Client-side model of a user's medicines with optimistic mutations.
+#
+# The store keeps the last server-confirmed medicines plus a list of pending
+# mutations. What the page shows (`medicines`) is the confirmed state with
+# every pending mutation applied on top, so "Mark as Taken", "Delete" and
+# "Set Reminder" show up immediately. Each mutation is sent in the background
+# (see jobs.py); `settle()` folds finished ones back in: successes update the
+# confirmed state from the server, rejections are dropped (rolling the change
+# back) and leave an error on the medicine.
+#
+# Mutations made together (several doses taken, several reminder times) are
+# sent as one batch (see mutation_batch.py) and followed by a single re-read
+# of the medicines they touched. Batches touching the same medicine are sent
+# one after another, in the order they were made.
+#
+# Medicine dicts may be the read-only parsed bodies kept by response_store,
+# so mutations replace a medicine instead of editing it in place.
+
+import itertools
+
+import requests
+
+import jobs
+import mutation_batch
+from liveness import BackendWaking
+from mutation_batch import Operation
+
+_temp_ids = itertools.count(1)
+
+
+class Mutation:
+    def __init__(self, kind, med_id, job, **data):
+        self.kind = kind
+        self.med_id = med_id
+        self.job = job
+        self.data = data
+
+    def apply(self, medicines):
+        med = medicines.get(self.med_id)
+        if med is None:
+            return
+        if self.kind == 'take':
+            medicines[self.med_id] = {**med, 'inventory': max(0, med.get('inventory', 0) - self.data['quantity'])}
+        elif self.kind == 'delete':
+            del medicines[self.med_id]
+        elif self.kind == 'add_reminder':
+            medicines[self.med_id] = {**med, 'reminders': [*med.get('reminders', []), self.data['reminder']]}
+
+
+class BatchItem:
+    """One mutation's view of a batch job, shaped like a jobs.Job."""
+
+    def __init__(self, job, index):
+        self.job = job
+        self.index = index
+
+    def done(self):
+        return self.job.done()
+
+    @property
+    def error(self):
+        if self.job.error is not None:
+            return self.job.error
+        return self.job.result[0][self.index]
+
+    @property
+    def result(self):
+        # {id: med} re-read after the batch, or None
+        return None if self.job.error is not None else self.job.result[1]
+
+
+class MedicineStore:
+    def __init__(self):
+        self.confirmed = {}
+        self.pending = []
+        self.errors = {}
+        self.medicines = {}
+        self.version = None
+
+    def load(self, medicines, version=None):
+        """Replace the confirmed state with a freshly fetched medicine list.
+
+        Loading the same `version` (see response_store) again is a no-op.
+        Medicines with pending mutations keep their confirmed copy: the
+        list may already include a change whose request landed before its
+        job settled, and applying the mutation on top would count it twice.
+        settle() brings in the server's copy once the mutation finishes.
+        """
+        if version is not None and version == self.version:
+            return
+        confirmed = {med.get('id'): med for med in medicines}
+        busy = {m.med_id for m in self.pending}
+        confirmed.update((med_id, med) for med_id, med in self.confirmed.items() if med_id in busy)
+        self.confirmed = confirmed
+        self.version = version
+        self._rebuild()
+
+    def _rebuild(self):
+        if not self.pending:
+            # Nothing to overlay: share the confirmed dict instead of copying it
+            self.medicines = self.confirmed
+            return
+        medicines = dict(self.confirmed)
+        for mutation in self.pending:
+            mutation.apply(medicines)
+        self.medicines = medicines
+
+    def release(self):
+        """Drop the loaded medicines unless changes are pending; load() restores them."""
+        self.settle()
+        if self.pending:
+            return
+        self.confirmed = {}
+        self.medicines = self.confirmed
+        self.version = None
+
+    def has_pending(self):
+        return bool(self.pending)
+
+    # --- MUTATIONS (applied locally, sent in the background) ---
+    def take_dose(self, api, med_id, rem_id):
+        self.take_doses(api, [(med_id, rem_id)])
+
+    def take_doses(self, api, doses):
+        """Mark several (med_id, rem_id) doses as taken in one batch."""
+        items = []
+        for med_id, rem_id in doses:
+            med = self.medicines.get(med_id, {})
+            quantity = next((rem.get('quantity', 0) for rem in med.get('reminders', []) if rem.get('id') == rem_id), 0)
+            items.append(('take', med_id, Operation('POST', f"/reminder/reminders/{rem_id}/take/", group=med_id),
+                          {'quantity': quantity}))
+        self._submit(api, items)
+
+    def delete_medicine(self, api, med_id):
+        self._submit(api, [('delete', med_id, Operation('DELETE', f"/reminder/medicines/{med_id}/", group=med_id), {})])
+
+    def add_reminder(self, api, med_id, rem_data):
+        self.add_reminders(api, med_id, [rem_data])
+
+    def add_reminders(self, api, med_id, reminders):
+        """Add several reminders (e.g. one per daily time) to a medicine in one batch."""
+        items = []
+        for rem_data in reminders:
+            reminder = {**rem_data, 'id': f"pending-{next(_temp_ids)}", 'pending': True}
+            items.append(('add_reminder', med_id,
+                          Operation('POST', f"/reminder/medicines/{med_id}/reminders/", rem_data, group=med_id),
+                          {'reminder': reminder}))
+        self._submit(api, items)
+
+    def _submit(self, api, items):
+        # items: (kind, med_id, operation, data) sent as one batch; the job's
+        # result is (errors per item, re-read medicines or None)
+        if not items:
+            return
+        # A batch waits for earlier ones touching the same medicines, so a
+        # Take followed by a Delete reaches the server in that order even
+        # when they come from separate clicks
+        med_ids = {med_id for _, med_id, _, _ in items}
+        earlier = list({id(m.job.job): m.job.job for m in self.pending if m.med_id in med_ids}.values())
+
+        def send():
+            for job in earlier:
+                job.wait()
+            errors = mutation_batch.send(api, [op for _, _, op, _ in items])
+            deleted = {med_id for (kind, med_id, _, _), error in zip(items, errors) if kind == 'delete' and error is None}
+            changed = [med_id for (kind, med_id, _, _), error in zip(items, errors) if error is None and med_id not in deleted]
+            try:
+                return errors, _fetch_medicines(api, list(dict.fromkeys(changed)))
+            except requests.exceptions.RequestException:
+                return errors, None
+
+        key = (api.sessionid, 'medicine-mutation', next(_temp_ids))
+        job = jobs.submit(key, send)
+        for index, (kind, med_id, _, data) in enumerate(items):
+            self.pending.append(Mutation(kind, med_id, BatchItem(job, index), **data))
+            self.errors.pop(med_id, None)
+        self._rebuild()
+
+    # --- RECONCILIATION ---
+    def settle(self):
+        """Fold finished mutations back in; returns the ids whose view changed."""
+        finished = [m for m in self.pending if m.job.done()]
+        if not finished:
+            return set()
+        before = dict(self.medicines)
+        self.pending = [m for m in self.pending if not m.job.done()]
+        for mutation in finished:
+            if mutation.job.error is not None:
+                if isinstance(mutation.job.error, BackendWaking):
+                    self.errors[mutation.med_id] = str(mutation.job.error)
+                elif isinstance(mutation.job.error, requests.exceptions.RequestException):
+                    self.errors[mutation.med_id] = "Could not connect to the API."
+                else:
+                    self.errors[mutation.med_id] = str(mutation.job.error)
+            elif mutation.kind == 'delete':
+                self.confirmed.pop(mutation.med_id, None)
+            elif mutation.job.result is not None:
+                for med_id, med in mutation.job.result.items():
+                    if med is None:
+                        self.confirmed.pop(med_id, None)
+                    else:
+                        self.confirmed[med_id] = med
+            else:
+                mutation.apply(self.confirmed)
+        self._rebuild()
+        changed = {m.med_id for m in finished if before.get(m.med_id) != self.medicines.get(m.med_id)}
+        return changed | {m.med_id for m in finished if m.job.error is not None}
+
+
+def _fetch_medicines(api, med_ids):
+    # Server copies of several medicines with one request where possible
+    if not med_ids:
+        return {}
+    if len(med_ids) == 1:
+        return _fetch_medicine(api, med_ids[0])
+    response = api.get("/reminder/medicines/")
+    if response.status_code == 200:
+        by_id = {med.get('id'): med for med in response.json()}
+        return {med_id: by_id.get(med_id) for med_id in med_ids}
+    return None
+
+
+def _fetch_medicine(api, med_id):
+    # Server copy of one medicine as {id: med} ({id: None} once it is gone),
+    # or None if it could not be re-read and the optimistic change stands
+    response = api.get(f"/reminder/medicines/{med_id}/")
+    if response.status_code == 200:
+        return {med_id: response.json()}
+    # No usable detail endpoint: fall back to the (just invalidated) list
+    response = api.get("/reminder/medicines/")
+    if response.status_code == 200:
+        return {med_id: next((med for med in response.json() if med.get('id') == med_id), None)}
+    return None
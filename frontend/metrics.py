@@ -0,0 +1,318 @@
+# metrics.py
+# In-process counters, gauges and histograms exported as Prometheus text.
+#
+# app.py times every script rerun per page and counts the elements it sends
+# to the browser; api_client records latency, status and bytes for every
+# backend call. Streamlit workers started by server.py write a snapshot of
+# their metrics to CURA_METRICS_DIR every few seconds, and server.py merges
+# those snapshots with its own metrics and serves them at /metrics.
+# session_memory() accounts for what each session keeps in session_state.
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+
+METRICS_DIR = os.environ.get('CURA_METRICS_DIR')   # unset: nothing is written
+SESSION_BUDGET = int(os.environ.get('CURA_SESSION_BUDGET_BYTES', 256 * 1024))   # per-session state target
+FLUSH_INTERVAL = float(os.environ.get('CURA_METRICS_FLUSH', 5))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+COUNT_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_ID_SEGMENT = re.compile(r'/\d+(?=/|$)')
+
+
+class Registry:
+    """Thread-safe set of labelled metrics.
+
+    A snapshot is plain JSON: {name: {kind, help, buckets, samples}} where
+    samples is a list of [labels, value] and a histogram value is its
+    per-bucket counts (the last one is +Inf) followed by the sum.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _define(self, kind, name, help, buckets=None):
+        self._metrics.setdefault(name, {'kind': kind, 'help': help, 'buckets': buckets, 'samples': {}})
+
+    def counter(self, name, help):
+        self._define('counter', name, help)
+
+    def gauge(self, name, help):
+        self._define('gauge', name, help)
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS):
+        self._define('histogram', name, help, list(buckets))
+
+    def inc(self, name, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            samples = self._metrics[name]['samples']
+            samples[key] = samples.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._metrics[name]['samples'][tuple(sorted(labels.items()))] = value
+
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            metric = self._metrics[name]
+            buckets = metric['buckets']
+            counts = metric['samples'].setdefault(key, [0] * (len(buckets) + 1) + [0.0])
+            index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+            counts[index] += 1
+            counts[-1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: {'kind': m['kind'], 'help': m['help'], 'buckets': m['buckets'],
+                       'samples': [[list(key), value[:] if isinstance(value, list) else value]
+                                   for key, value in m['samples'].items()]}
+                for name, m in self._metrics.items()
+            }
+
+
+registry = Registry()
+registry.histogram('cura_rerun_seconds', "Streamlit script rerun time by page.")
+registry.histogram('cura_rerun_elements', "Elements and blocks sent to the browser per rerun.", COUNT_BUCKETS)
+registry.counter('cura_rerun_delta_bytes_total', "Bytes of delta messages sent to the browser.")
+registry.counter('cura_reruns_total', "Script reruns by page and outcome.")
+registry.histogram('cura_backend_request_seconds', "Backend request latency by endpoint.")
+registry.counter('cura_backend_responses_total', "Backend responses by endpoint and status.")
+registry.counter('cura_backend_response_bytes_total', "Backend response body bytes by endpoint.")
+
+# Most recent reruns of this process, for the admin debug overlay
+recent_reruns = deque(maxlen=50)
+
+_collectors = []
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def endpoint_label(path):
+    """Collapse ids so /reminder/medicines/42/ is reported as /reminder/medicines/{id}/."""
+    return _ID_SEGMENT.sub('/{id}', path.split('?', 1)[0])
+
+
+def observe_backend(method, path, status, seconds, nbytes):
+    endpoint = endpoint_label(path)
+    registry.observe('cura_backend_request_seconds', seconds, method=method, endpoint=endpoint)
+    registry.inc('cura_backend_responses_total', method=method, endpoint=endpoint, status=str(status))
+    registry.inc('cura_backend_response_bytes_total', nbytes, method=method, endpoint=endpoint)
+    _ensure_flusher()
+
+
+def add_collector(fn):
+    """Register `fn(registry)`, called to refresh gauges before each snapshot."""
+    _collectors.append(fn)
+
+
+# --- RERUN TIMING ---
+class rerun_timer:
+    """Times one script rerun of `page` and counts the elements it emits.
+
+    Element counts come from wrapping the script run context's message
+    queue, so they cover everything the rerun sends, widgets included.
+    """
+
+    def __init__(self, page):
+        self.page = page
+        self.counts = None
+
+    def __enter__(self):
+        self.counts = _delta_counts()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.started
+        if exc_type is None:
+            outcome = 'ok'
+        elif issubclass(exc_type, Exception):
+            outcome = 'error'
+        else:
+            # st.rerun() / st.stop() unwind the script with a BaseException
+            outcome = 'interrupted'
+        elements, nbytes = self.counts if self.counts is not None else (0, 0)
+        registry.observe('cura_rerun_seconds', seconds, page=self.page)
+        registry.inc('cura_reruns_total', page=self.page, outcome=outcome)
+        if self.counts is not None:
+            registry.observe('cura_rerun_elements', elements, page=self.page)
+            registry.inc('cura_rerun_delta_bytes_total', nbytes, page=self.page)
+        recent_reruns.append({'page': self.page, 'seconds': seconds, 'elements': elements,
+                              'bytes': nbytes, 'outcome': outcome, 'at': time.time()})
+        _ensure_flusher()
+        return False
+
+
+def _delta_counts():
+    # Returns a fresh [elements, bytes] list that the current run's enqueue
+    # wrapper adds to, or None outside a Streamlit script run
+    try:
+        from streamlit.runtime.scriptrunner_utils.script_run_context import get_script_run_ctx
+    except ImportError:
+        return None
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None:
+        return None
+    counts = [0, 0]
+    ctx._cura_counts = counts
+    if not getattr(ctx, '_cura_wrapped', False):
+        enqueue = ctx._enqueue
+
+        def counting_enqueue(msg):
+            if msg.WhichOneof('type') == 'delta':
+                ctx._cura_counts[0] += msg.delta.WhichOneof('type') in ('new_element', 'add_block')
+                ctx._cura_counts[1] += msg.ByteSize()
+            enqueue(msg)
+
+        ctx._enqueue = counting_enqueue
+        ctx._cura_wrapped = True
+    return counts
+
+
+# --- SESSION MEMORY ---
+def deep_sizeof(obj, seen=None):
+    """Approximate retained size of `obj` and everything it references."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen or isinstance(obj, type):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, '__dict__'):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+
+def session_memory(state, shared=()):
+    """Approximate bytes held by each session_state key, largest first.
+
+    Objects reachable from `shared` (e.g. response bodies every session of
+    a user reads from response_store) are not charged to the session.
+    """
+    seen = set()
+    for obj in shared:
+        deep_sizeof(obj, seen)
+    sizes = {key: deep_sizeof(state[key], seen) for key in list(state.keys())}
+    return dict(sorted(sizes.items(), key=lambda item: -item[1]))
+
+
+# --- SNAPSHOTS (one file per worker process) ---
+def _ensure_flusher():
+    global _flusher
+    if METRICS_DIR is None or _flusher is not None:
+        return
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_forever, name='cura-metrics', daemon=True)
+            _flusher.start()
+
+
+def _flush_forever():
+    while True:
+        try:
+            write_snapshot(METRICS_DIR)
+        except OSError:
+            pass
+        time.sleep(FLUSH_INTERVAL)
+
+
+def collect():
+    for fn in _collectors:
+        fn(registry)
+    return registry.snapshot()
+
+
+def write_snapshot(directory):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"worker-{os.getpid()}.json")
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(collect(), f)
+    os.replace(tmp, path)   # readers never see a half-written file
+
+
+def read_snapshots(directory):
+    """Load every live worker's snapshot; files of exited workers are removed."""
+    snapshots = []
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return snapshots
+    for name in names:
+        match = re.fullmatch(r'worker-(\d+)\.json', name)
+        if not match:
+            continue
+        path = os.path.join(directory, name)
+        try:
+            os.kill(int(match.group(1)), 0)
+        except ProcessLookupError:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        except PermissionError:
+            pass
+        try:
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+# --- PROMETHEUS TEXT FORMAT ---
+def render(snapshots):
+    """Sum `snapshots` metric by metric and return Prometheus exposition text."""
+    merged = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, {**metric, 'samples': {}})
+            for labels, value in metric['samples']:
+                key = tuple(map(tuple, labels))
+                if isinstance(value, list):
+                    current = target['samples'].get(key)
+                    target['samples'][key] = value if current is None else [a + b for a, b in zip(current, value)]
+                else:
+                    target['samples'][key] = target['samples'].get(key, 0) + value
+
+    lines = []
+    for name in sorted(merged):
+        metric = merged[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        for key, value in sorted(metric['samples'].items()):
+            if metric['kind'] != 'histogram':
+                lines.append(f"{name}{_labels(key)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric['buckets'] + ['+Inf'], value[:-1]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(key + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(key)} {_number(value[-1])}")
+            lines.append(f"{name}_count{_labels(key)} {cumulative}")
+    return '\n'.join(lines) + '\n'
+
+
+def _labels(key):
+    if not key:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in key)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(key, escaped)) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
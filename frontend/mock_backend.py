@@ -0,0 +1,486 @@
+# mock_backend.py
+# Local stand-in for the CURA backend, for development and benchmarks.
+#
+# Implements the endpoints app.py uses, keeps all data in memory and can
+# simulate network latency, a Render-style cold start after idle periods and
+# random server errors. Reads carry ETag or Last-Modified validators and
+# answer conditional requests with 304, or send no validators at all
+# (--validators none), like a plain backend. Diet plans are generated as a
+# Server-Sent Events stream (summary, one event per meal, grocery batches,
+# done) when the request accepts text/event-stream, unless --no-streaming is
+# given. POST /reminder/batch/ applies several mutations in one request
+# (404 with --no-batch, like a backend without it). Run it and point the
+# frontend at it:
+#
+#   python mock_backend.py --port 8600 --latency 40 --cold-start 8
+#   CURA_BASE_URL=http://127.0.0.1:8600/api streamlit run app.py
+#
+# GET /__stats__ returns per-endpoint and per-user call counts (?user=<email>
+# for a single user);
+# POST /__reset__ clears them.
+
+import argparse
+import hashlib
+import itertools
+import json
+import random
+import re
+import secrets
+import threading
+import time
+from collections import Counter, defaultdict
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class MockConfig:
+    def __init__(self, latency=0.0, jitter=0.0, cold_start=0.0, idle_timeout=900.0,
+                 error_rate=0.0, generate_delay=1.0, seed_medicines=0, reminders_per_medicine=2,
+                 grocery_items=12, validators='etag', streaming=True, batch=True):
+        self.latency = latency                # seconds added to every request
+        self.jitter = jitter                  # +/- uniform seconds on top of latency
+        self.cold_start = cold_start          # delay for the first request after idling
+        self.idle_timeout = idle_timeout      # idle seconds before the next request is "cold"
+        self.error_rate = error_rate          # fraction of API requests answered with 500
+        self.generate_delay = generate_delay  # time to "generate" a diet plan
+        self.seed_medicines = seed_medicines  # medicines created for every new user
+        self.reminders_per_medicine = reminders_per_medicine
+        self.grocery_items = grocery_items
+        self.validators = validators          # 'etag', 'last-modified' or 'none'
+        self.streaming = streaming            # stream generated plans as SSE when asked to
+        self.batch = batch                    # serve POST /reminder/batch/
+
+
+class MockState:
+    def __init__(self, config):
+        self.config = config
+        self.lock = threading.RLock()   # handlers may reply (and stamp validators) while holding it
+        self.users = {}                 # email -> {'username', 'password'}
+        self.sessions = {}              # sessionid -> email
+        self.profiles = {}              # email -> profile
+        self.plans = {}                 # email -> plan
+        self.medicines = defaultdict(dict)   # email -> {id: medicine}
+        self.ids = itertools.count(1)
+        self.last_request = 0.0
+        self.booted_at = 0.0            # end of the current simulated cold start
+        self.modified = {}              # email -> Last-Modified (whole seconds) of their data
+        self.not_modified = 0           # 304s sent
+        self.calls = Counter()          # route handler name -> count
+        self.user_calls = Counter()     # email -> count (login/signup included)
+
+    def create_user(self, username, email, password):
+        self.users[email] = {'username': username, 'password': password}
+        for i in range(self.config.seed_medicines):
+            self.add_medicine(email, {'name': f"Medicine {i + 1}", 'dosage': '500mg', 'inventory': 60})
+            med_id = max(self.medicines[email])
+            for r in range(self.config.reminders_per_medicine):
+                self.add_reminder(email, med_id, {'time': f"{8 + 6 * r:02d}:00", 'quantity': 1,
+                                                  'instruction': 'After Food'})
+
+    def add_medicine(self, email, data):
+        med = {'id': next(self.ids), 'name': data.get('name', ''), 'dosage': data.get('dosage', ''),
+               'inventory': int(data.get('inventory', 0)), 'reminders': []}
+        self.medicines[email][med['id']] = med
+        return med
+
+    def add_reminder(self, email, med_id, data):
+        rem = {'id': next(self.ids), 'time': data.get('time', ''), 'quantity': int(data.get('quantity', 1)),
+               'instruction': data.get('instruction', 'Any Time')}
+        self.medicines[email][med_id]['reminders'].append(rem)
+        return rem
+
+    def touch(self, email):
+        # Last-Modified has one-second resolution: always move it forward
+        self.modified[email] = max(int(time.time()) + 1, self.modified.get(email, 0) + 1)
+
+    def build_plan(self, email):
+        profile = self.profiles.get(email, {})
+        calories = 1800 + 10 * int(profile.get('age', 25) or 25)
+        return {
+            'daily_calories': calories,
+            'macronutrients': {'protein_grams': calories // 20, 'carbs_grams': calories // 8, 'fat_grams': calories // 30},
+            'notes': "Stay hydrated and keep portions moderate.",
+            'meals': {
+                'breakfast': {'name': 'Oats with berries', 'time': '08:00', 'calories': calories // 4,
+                              'notes': 'Add a spoon of nuts.'},
+                'lunch': {'name': 'Grilled vegetables and rice', 'time': '13:00', 'calories': calories // 3},
+                'snack': {'name': 'Greek yogurt', 'time': '16:30', 'calories': calories // 10},
+                'dinner': {'name': 'Lentil soup and salad', 'time': '19:30', 'calories': calories // 4},
+            },
+            'grocery_list': [f"Item {i + 1}" for i in range(self.config.grocery_items)],
+        }
+
+    def generate_plan(self, email):
+        self.plans[email] = self.build_plan(email)
+
+
+# (method, pattern) -> handler name; patterns match the path after /api
+ROUTES = [
+    ('POST', r'/auth/login/', 'login'),
+    ('POST', r'/auth/signup/', 'signup'),
+    ('GET', r'/diet/profile/', 'get_profile'),
+    ('POST', r'/diet/profile/', 'save_profile'),
+    ('GET', r'/diet/plan/', 'get_plan'),
+    ('POST', r'/diet/plan/generate/', 'generate_plan'),
+    ('GET', r'/reminder/medicines/', 'list_medicines'),
+    ('POST', r'/reminder/medicines/', 'add_medicine'),
+    ('GET', r'/reminder/medicines/(\d+)/', 'get_medicine'),
+    ('DELETE', r'/reminder/medicines/(\d+)/', 'delete_medicine'),
+    ('POST', r'/reminder/medicines/(\d+)/reminders/', 'add_reminder'),
+    ('POST', r'/reminder/reminders/(\d+)/take/', 'take_reminder'),
+    ('POST', r'/reminder/batch/', 'batch'),
+]
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def do_DELETE(self):
+        self.dispatch('DELETE')
+
+    # --- Plumbing ---
+    def send_json(self, status, body=None, headers=None):
+        payload = json.dumps(body).encode() if body is not None else b''
+        headers = dict(headers or {})
+        if self.command == 'GET' and status == 200 and self.user is not None:
+            headers.update(self.validators(payload))
+            if self.not_modified(headers):
+                with self.state.lock:
+                    self.state.not_modified += 1
+                self.send_response(304)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                return
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def validators(self, payload):
+        mode = self.state.config.validators
+        if mode == 'etag':
+            return {'ETag': f'"{hashlib.sha1(payload).hexdigest()[:20]}"'}
+        if mode == 'last-modified':
+            with self.state.lock:
+                modified = self.state.modified.setdefault(self.user, int(time.time()))
+            return {'Last-Modified': formatdate(modified, usegmt=True)}
+        return {}
+
+    def not_modified(self, headers):
+        if 'ETag' in headers:
+            tags = [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]
+            return headers['ETag'] in tags
+        if 'Last-Modified' in headers and self.headers.get('If-Modified-Since'):
+            try:
+                since = parsedate_to_datetime(self.headers['If-Modified-Since'])
+            except (TypeError, ValueError):
+                return False
+            return parsedate_to_datetime(headers['Last-Modified']) <= since
+        return False
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return {}
+
+    def session(self):
+        cookie = self.headers.get('Cookie', '')
+        match = re.search(r'sessionid=([^;]+)', cookie)
+        return match.group(1) if match else None
+
+    def simulate_network(self, state):
+        config = state.config
+        with state.lock:
+            now = time.monotonic()
+            if config.cold_start and now - state.last_request > config.idle_timeout and now >= state.booted_at:
+                state.booted_at = now + config.cold_start
+            state.last_request = now
+            # Like the real host, every request that arrives while booting waits for the boot
+            booting = max(0.0, state.booted_at - now)
+        delay = config.latency + random.uniform(-config.jitter, config.jitter) + booting
+        if delay > 0:
+            time.sleep(delay)
+
+    def dispatch(self, method):
+        state = self.state
+        self.user = None
+        path = self.path.split('?', 1)[0]
+        # Always drain the request body so the kept-alive connection stays usable
+        body = self.read_json() if method == 'POST' else {}
+        if path == '/__stats__' and method == 'GET':
+            user = parse_qs(urlsplit(self.path).query).get('user', [None])[0]
+            with state.lock:
+                if user is not None:
+                    return self.send_json(200, {'user_calls': state.user_calls.get(user, 0)})
+                return self.send_json(200, {'calls': dict(state.calls), 'user_calls': dict(state.user_calls),
+                                            'not_modified': state.not_modified})
+        if path == '/__reset__' and method == 'POST':
+            with state.lock:
+                state.calls.clear()
+                state.user_calls.clear()
+                state.not_modified = 0
+            return self.send_json(200, {})
+        if not path.startswith('/api/'):
+            return self.send_json(404, {'detail': 'Not found.'})
+        self.simulate_network(state)
+
+        path = path[len('/api'):]
+        for route_method, pattern, name in ROUTES:
+            match = re.fullmatch(pattern, path)
+            if match and route_method == method:
+                break
+        else:
+            return self.send_json(404, {'detail': 'Not found.'})
+
+        sessionid = self.session()
+        with state.lock:
+            user = body.get('email') if name in ('login', 'signup') else state.sessions.get(sessionid)
+            state.calls[name] += 1
+            if user:
+                state.user_calls[user] += 1
+        if random.random() < state.config.error_rate:
+            return self.send_json(500, {'error': 'Injected server error.'})
+
+        if name not in ('login', 'signup'):
+            with state.lock:
+                email = state.sessions.get(sessionid)
+                if email is not None and method != 'GET':
+                    state.touch(email)
+            if email is None:
+                return self.send_json(403, {'detail': 'Authentication credentials were not provided.'})
+            self.user = email
+            return getattr(self, name)(state, email, body, *[int(g) for g in match.groups()])
+        return getattr(self, name)(state, body)
+
+    # --- Auth ---
+    def login(self, state, body):
+        with state.lock:
+            user = state.users.get(body.get('email'))
+            if user is None or user['password'] != body.get('password'):
+                return self.send_json(400, {'error': 'Invalid credentials.'})
+            sessionid = secrets.token_hex(16)
+            state.sessions[sessionid] = body['email']
+        self.send_json(200, {'message': f"Welcome back, {user['username']}!", 'email': body['email']},
+                       {'Set-Cookie': f"sessionid={sessionid}; HttpOnly; Path=/"})
+
+    def signup(self, state, body):
+        with state.lock:
+            if not body.get('email') or not body.get('password'):
+                return self.send_json(400, {'error': 'Email and password are required.'})
+            if body['email'] in state.users:
+                return self.send_json(400, {'error': 'A user with that email already exists.'})
+            state.create_user(body.get('username', ''), body['email'], body['password'])
+        self.send_json(201, {'message': 'User created successfully.'})
+
+    # --- Diet ---
+    def get_profile(self, state, email, body):
+        with state.lock:
+            profile = state.profiles.get(email)
+        if profile is None:
+            return self.send_json(404, {'error': 'Profile not found.'})
+        self.send_json(200, profile)
+
+    def save_profile(self, state, email, body):
+        with state.lock:
+            created = email not in state.profiles
+            state.profiles[email] = body
+        self.send_json(201 if created else 200, body)
+
+    def get_plan(self, state, email, body):
+        with state.lock:
+            plan = state.plans.get(email)
+        if plan is None:
+            return self.send_json(404, {'error': 'No diet plan found.'})
+        self.send_json(200, plan)
+
+    def send_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def send_events(self, status, events, delay=0.0):
+        """Send (event, data) pairs as a chunked SSE stream, sleeping `delay` before each."""
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for event, data in events:
+            if delay:
+                time.sleep(delay)
+            self.send_chunk(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode())
+        self.send_chunk(b'')
+
+    def generate_plan(self, state, email, body):
+        if state.config.streaming and 'text/event-stream' in self.headers.get('Accept', ''):
+            return self.stream_plan(state, email)
+        time.sleep(state.config.generate_delay)
+        with state.lock:
+            state.generate_plan(email)
+            plan = state.plans[email]
+        self.send_json(201, plan)
+
+    def stream_plan(self, state, email):
+        with state.lock:
+            plan = state.build_plan(email)
+
+        def events():
+            yield 'summary', {key: plan[key] for key in ('daily_calories', 'macronutrients', 'notes')}
+            for key, meal in plan['meals'].items():
+                yield 'meal', {'key': key, 'meal': meal}
+            items = plan['grocery_list']
+            for i in range(0, len(items), 4):
+                yield 'grocery', {'items': items[i:i + 4]}
+            # Like the real backend, the plan is only saved once it is complete
+            with state.lock:
+                state.plans[email] = plan
+                state.touch(email)
+            yield 'done', plan
+
+        pieces = 2 + len(plan['meals']) + -(-len(plan['grocery_list']) // 4)
+        self.send_events(201, events(), state.config.generate_delay / pieces)
+
+    # --- Reminders ---
+    def list_medicines(self, state, email, body):
+        with state.lock:
+            medicines = list(state.medicines[email].values())
+            self.send_json(200, medicines)
+
+    def add_medicine(self, state, email, body):
+        if not body.get('name'):
+            return self.send_json(400, {'error': 'Medicine name is required.'})
+        with state.lock:
+            med = state.add_medicine(email, body)
+        self.send_json(201, med)
+
+    def get_medicine(self, state, email, body, med_id):
+        with state.lock:
+            med = state.medicines[email].get(med_id)
+            if med is None:
+                return self.send_json(404, {'error': 'Medicine not found.'})
+            self.send_json(200, med)
+
+    def delete_medicine(self, state, email, body, med_id):
+        with state.lock:
+            if state.medicines[email].pop(med_id, None) is None:
+                return self.send_json(404, {'error': 'Medicine not found.'})
+        self.send_json(204)
+
+    def add_reminder(self, state, email, body, med_id):
+        with state.lock:
+            if med_id not in state.medicines[email]:
+                return self.send_json(404, {'error': 'Medicine not found.'})
+            rem = state.add_reminder(email, med_id, body)
+        self.send_json(201, rem)
+
+    def take_reminder(self, state, email, body, rem_id):
+        with state.lock:
+            for med in state.medicines[email].values():
+                rem = next((r for r in med['reminders'] if r['id'] == rem_id), None)
+                if rem is not None:
+                    break
+            else:
+                return self.send_json(404, {'error': 'Reminder not found.'})
+            if med['inventory'] < rem['quantity']:
+                return self.send_json(400, {'error': 'Not enough inventory left.'})
+            med['inventory'] -= rem['quantity']
+            self.send_json(200, {'message': 'Dose recorded.', 'inventory': med['inventory']})
+
+    # --- Batch ---
+    def batch(self, state, email, body):
+        if not state.config.batch:
+            return self.send_json(404, {'detail': 'Not found.'})
+        results = [self.run_operation(state, email, op) for op in body.get('operations', [])]
+        self.send_json(200, {'results': results})
+
+    def run_operation(self, state, email, op):
+        # Runs one mutation's handler, capturing its reply instead of sending it
+        for route_method, pattern, name in ROUTES:
+            match = re.fullmatch(pattern, op.get('path') or '')
+            if match and route_method == op.get('method') and route_method != 'GET' and name != 'batch':
+                break
+        else:
+            return {'status': 404, 'body': {'detail': 'Not found.'}}
+        reply = {}
+        self.send_json = lambda status, body=None, headers=None: reply.update(status=status, body=body)
+        try:
+            getattr(self, name)(state, email, op.get('body') or {}, *[int(g) for g in match.groups()])
+        finally:
+            del self.send_json
+        return reply
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def make_server(host='127.0.0.1', port=0, config=None):
+    state = MockState(config or MockConfig())
+    server = MockServer((host, port), type('BoundMockHandler', (MockHandler,), {'state': state}))
+    server.state = state
+    server.base_url = f"http://{host}:{server.server_address[1]}/api"
+    return server
+
+
+def start(host='127.0.0.1', port=0, config=None):
+    """Start the mock backend on a background thread; returns the server."""
+    server = make_server(host, port, config)
+    threading.Thread(target=server.serve_forever, name='mock-backend', daemon=True).start()
+    return server
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Local mock of the CURA backend.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8600)
+    parser.add_argument('--latency', type=float, default=0, help="added latency per request (ms)")
+    parser.add_argument('--jitter', type=float, default=0, help="latency jitter (ms)")
+    parser.add_argument('--cold-start', type=float, default=0, help="cold-start delay after idling (s)")
+    parser.add_argument('--idle-timeout', type=float, default=900, help="idle time before a cold start (s)")
+    parser.add_argument('--error-rate', type=float, default=0, help="fraction of requests failing with 500")
+    parser.add_argument('--generate-delay', type=float, default=1, help="diet plan generation time (s)")
+    parser.add_argument('--seed-medicines', type=int, default=0, help="medicines created for each new user")
+    parser.add_argument('--validators', choices=('etag', 'last-modified', 'none'), default='etag',
+                        help="cache validators sent with reads")
+    parser.add_argument('--no-streaming', dest='streaming', action='store_false',
+                        help="always answer plan generation with plain JSON")
+    parser.add_argument('--no-batch', dest='batch', action='store_false',
+                        help="answer the batch endpoint with 404")
+    return parser.parse_args(argv)
+
+
+def config_from_args(args):
+    return MockConfig(latency=args.latency / 1000, jitter=args.jitter / 1000, cold_start=args.cold_start,
+                      idle_timeout=args.idle_timeout, error_rate=args.error_rate,
+                      generate_delay=args.generate_delay, seed_medicines=args.seed_medicines,
+                      validators=args.validators, streaming=args.streaming,
+                      batch=args.batch)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    server = make_server(args.host, args.port, config_from_args(args))
+    print(f"Mock CURA backend at {server.base_url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,113 @@
+# mutation_batch.py
+# Sends several mutations (dose taken, reminder added, ...) as one batch.
+#
+# If the backend has a batch endpoint, the whole batch is one request:
+#
+#   POST BATCH_PATH {"operations": [{"method": ..., "path": ..., "body": ...}]}
+#   -> {"results": [{"status": ..., "body": ...}]}
+#
+# A backend without one (404/405 for BATCH_PATH, remembered per process)
+# gets a bounded fan-out instead: operations run on at most FANOUT lanes at
+# once, and operations on the same group (medicine) share a lane so they
+# still reach the server in order.
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BATCH_PATH = os.environ.get('CURA_BATCH_PATH', '/reminder/batch/')   # empty: always fan out
+FANOUT = int(os.environ.get('CURA_BATCH_FANOUT', 4))                 # concurrent requests per batch
+WORKERS = int(os.environ.get('CURA_BATCH_WORKERS', 16))              # fan-out threads per process
+
+_pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='cura-batch')
+_batch_supported = None
+_batch_lock = threading.Lock()
+
+
+class Operation:
+    def __init__(self, method, path, body=None, group=None):
+        self.method = method
+        self.path = path
+        self.body = body
+        self.group = group      # operations of one group are sent in order
+
+    def as_json(self):
+        return {'method': self.method, 'path': self.path, 'body': self.body}
+
+
+def send(api, operations):
+    """Send `operations`; returns one exception (or None on success) per operation."""
+    if not operations:
+        return []
+    if len(operations) > 1 and BATCH_PATH and _batch_supported is not False:
+        errors = _send_batch(api, operations)
+        if errors is not None:
+            return errors
+    return _fan_out(api, operations)
+
+
+def rejection(response):
+    """RuntimeError describing a response the server rejected."""
+    try:
+        message = response.json().get('error')
+    except (ValueError, AttributeError):
+        message = None
+    return RuntimeError(message or f"The server rejected the change (HTTP {response.status_code}).")
+
+
+def _send_batch(api, operations):
+    # None means the backend has no batch endpoint
+    global _batch_supported
+    response = api.post(BATCH_PATH, json={'operations': [op.as_json() for op in operations]})
+    if response.status_code in (404, 405):
+        with _batch_lock:
+            _batch_supported = False
+        return None
+    if response.status_code >= 400:
+        error = rejection(response)
+        return [error] * len(operations)
+    with _batch_lock:
+        _batch_supported = True
+    results = response.json().get('results', [])
+    errors = []
+    for index in range(len(operations)):
+        result = results[index] if index < len(results) else {}
+        status = result.get('status', 500)
+        if status < 400:
+            errors.append(None)
+        else:
+            message = (result.get('body') or {}).get('error')
+            errors.append(RuntimeError(message or f"The server rejected the change (HTTP {status})."))
+    return errors
+
+
+def _fan_out(api, operations):
+    lanes = {}
+    for index, op in enumerate(operations):
+        group = op.group if op.group is not None else ('op', index)
+        lanes.setdefault(group, []).append(index)
+    # Whole groups are dealt round-robin onto FANOUT lanes
+    groups = list(lanes.values())
+    lanes = [[index for group in groups[i::FANOUT] for index in group] for i in range(min(FANOUT, len(groups)))]
+    errors = [None] * len(operations)
+
+    def run_lane(indices):
+        for index in indices:
+            errors[index] = _send_one(api, operations[index])
+
+    for future in [_pool.submit(run_lane, lane) for lane in lanes]:
+        future.result()
+    return errors
+
+
+def _send_one(api, op):
+    try:
+        if op.method == 'DELETE':
+            response = api.delete(op.path)
+        else:
+            response = api.post(op.path, json=op.body)
+    except requests.exceptions.RequestException as exc:
+        return exc
+    return rejection(response) if response.status_code >= 400 else None
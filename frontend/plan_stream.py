@@ -0,0 +1,132 @@
+# plan_stream.py
+# Progressive diet-plan generation.
+#
+# Generation is asked for as a stream: POST /diet/plan/generate/ with an
+# Accept header preferring Server-Sent Events (or newline-delimited JSON).
+# A backend that supports it sends the plan piece by piece:
+#
+#   summary  {"daily_calories": ..., "macronutrients": {...}, "notes": ...}
+#   meal     {"key": "breakfast", "meal": {...}}           (one per meal)
+#   grocery  {"items": [...]}                             (any number)
+#   done     the complete plan (optional)
+#   error    {"error": "..."}
+#
+# Each piece is folded into a PartialPlan that the Diet Plan page polls, so
+# macros, meal cards and grocery items appear as soon as they arrive. A
+# backend that answers with plain JSON is remembered as not streaming, and
+# later generations use the plain request/response flow.
+
+import json
+import os
+import threading
+import time
+
+import metrics
+
+# CURA_STREAM_PLANS=0 never asks the backend to stream
+ENABLED = os.environ.get('CURA_STREAM_PLANS', '1') != '0'
+ACCEPT = 'text/event-stream, application/x-ndjson;q=0.9, application/json;q=0.5'
+PATH = '/diet/plan/generate/'
+
+_supported = None   # learned from the first streamed generation
+_supported_lock = threading.Lock()
+
+
+def enabled():
+    """Whether the next generation should be requested as a stream."""
+    return ENABLED and _supported is not False
+
+
+def _learn(supported):
+    global _supported
+    with _supported_lock:
+        _supported = supported
+
+
+class PartialPlan:
+    """A diet plan filled in from stream events; safe to read while it grows."""
+
+    def __init__(self):
+        self.mode = 'pending'           # 'streaming' once events flow, 'unsupported' for plain JSON
+        self.started_at = time.monotonic()
+        self.first_content_at = None
+        self._plan = {}
+        self._lock = threading.Lock()
+
+    def apply(self, event, data):
+        with self._lock:
+            if event == 'summary':
+                self._plan.update(data)
+            elif event == 'meal':
+                self._plan['meals'] = {**self._plan.get('meals', {}), data['key']: data['meal']}
+            elif event == 'grocery':
+                self._plan['grocery_list'] = [*self._plan.get('grocery_list', []), *data.get('items', [])]
+            elif event == 'done':
+                self._plan = dict(data)
+            else:
+                return
+            if self.first_content_at is None:
+                self.first_content_at = time.monotonic()
+                metrics.registry.observe('cura_plan_first_content_seconds', self.first_content_at - self.started_at)
+
+    def snapshot(self):
+        """The plan so far, in the shape GET /diet/plan/ returns."""
+        with self._lock:
+            return dict(self._plan)
+
+
+def generate(api, partial):
+    """Generate a plan for the client's user, streaming it into `partial`."""
+    response = api.post(PATH, stream=True, headers={'Accept': ACCEPT})
+    try:
+        if response.status_code not in (200, 201, 202):
+            raise RuntimeError(response.json().get('error', f"HTTP {response.status_code}"))
+        content_type = response.headers.get('Content-Type', '')
+        if content_type.startswith('text/event-stream'):
+            events = _sse_events(response.iter_lines(decode_unicode=True))
+        elif content_type.startswith('application/x-ndjson'):
+            events = _ndjson_events(response.iter_lines(decode_unicode=True))
+        else:
+            _learn(False)
+            partial.mode = 'unsupported'
+            response.content    # read it all before the connection is released
+            return response
+        _learn(True)
+        partial.mode = 'streaming'
+        for event, data in events:
+            if event == 'error':
+                raise RuntimeError(data.get('error', "Plan generation failed."))
+            partial.apply(event, data)
+        return response
+    finally:
+        response.close()
+        # The plan is only stored once the stream ends, after post() has
+        # already invalidated the cached reads; drop anything read meanwhile
+        api.invalidate(PATH)
+
+
+def _sse_events(lines):
+    event, data = 'message', []
+    for line in lines:
+        if not line:
+            if data:
+                yield event, json.loads('\n'.join(data))
+            event, data = 'message', []
+        elif line.startswith(':'):
+            continue
+        elif line.startswith('event:'):
+            event = line[len('event:'):].strip()
+        elif line.startswith('data:'):
+            data.append(line[len('data:'):].lstrip())
+    if data:
+        yield event, json.loads('\n'.join(data))
+
+
+def _ndjson_events(lines):
+    for line in lines:
+        if line.strip():
+            item = json.loads(line)
+            yield item.pop('event', 'message'), item.get('data', item)
+
+
+metrics.registry.histogram('cura_plan_first_content_seconds', "Time from requesting a plan to its first streamed piece.")
@@ -0,0 +1,111 @@
+# read_cache.py
+# Per-user TTL cache for the backend's read endpoints.
+#
+# Entries are keyed by (user, path), expire after a TTL and are evicted
+# least-recently-used once the cache holds MAX_ENTRIES across all sessions.
+# Mutations made through the API client invalidate exactly the reads they
+# can change (see INVALIDATES).
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+TTL_SECONDS = float(os.environ.get('CURA_CACHE_TTL', 120))
+MAX_ENTRIES = int(os.environ.get('CURA_CACHE_MAX_ENTRIES', 2048))
+
+# GET endpoints whose responses are cached
+CACHEABLE_PATHS = ('/reminder/medicines/', '/diet/profile/', '/diet/plan/')
+
+# Mutation path prefix -> cached reads it invalidates
+INVALIDATES = (
+    ('/reminder/', ('/reminder/medicines/',)),
+    ('/diet/profile/', ('/diet/profile/',)),
+    ('/diet/plan/', ('/diet/plan/',)),
+)
+
+
+def stale_reads(path):
+    """Cacheable reads that a POST/DELETE to `path` can change."""
+    return [read for prefix, reads in INVALIDATES if path.startswith(prefix) for read in reads]
+
+
+class ReadCache:
+    def __init__(self, ttl=TTL_SECONDS, max_entries=MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # (user, path) -> (expires_at, value)
+        self._generations = {}          # user -> bumped on every invalidation
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def generation(self, user):
+        with self._lock:
+            return self._generations.get(user, 0)
+
+    def get(self, user, path):
+        key = (user, path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def has(self, user, path):
+        """Whether a live entry exists; does not count as a hit or miss."""
+        with self._lock:
+            entry = self._entries.get((user, path))
+            return entry is not None and entry[0] > time.monotonic()
+
+    def put(self, user, path, value, generation=None):
+        """Store `value`; skipped if `user` was invalidated since `generation`."""
+        with self._lock:
+            if generation is not None and generation != self._generations.get(user, 0):
+                return
+            self._entries[(user, path)] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end((user, path))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user, paths):
+        with self._lock:
+            self._generations[user] = self._generations.get(user, 0) + 1
+            for path in paths:
+                if self._entries.pop((user, path), None) is not None:
+                    self.invalidations += 1
+
+    def invalidate_mutation(self, user, path):
+        """Drop every cached read that a POST/DELETE to `path` can change."""
+        stale = stale_reads(path)
+        if stale:
+            self.invalidate(user, stale)
+
+    def clear_user(self, user):
+        with self._lock:
+            self._generations.pop(user, None)
+            for key in [k for k in self._entries if k[0] == user]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+cache = ReadCache()
@@ -0,0 +1,171 @@
+# response_store.py
+# Last response body and validators per user and endpoint, for conditional GETs.
+#
+# When a cached read expires or is invalidated, api_client revalidates it
+# instead of downloading it again: it sends the stored ETag / Last-Modified
+# as If-None-Match / If-Modified-Since and, on 304 Not Modified, reuses the
+# stored body and its already-parsed JSON. Backends that send no validators
+# still get the full body, but if its content hash matches the stored one
+# the parsed object (and its version) are reused, so nothing is re-parsed
+# and pages can skip work for unchanged data by comparing `version`.
+#
+# Bodies are also written through to disk_cache under the user's owner key
+# (a hash of their login), so they outlive the process and the session. A
+# stored body that this session's own mutations have made stale is marked
+# dirty: it still provides validators, but must not be shown as current.
+#
+# Parsed bodies are shared between reruns and sessions of the same user:
+# treat them as read-only.
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from disk_cache import disk
+
+MAX_BYTES = int(os.environ.get('CURA_BODY_STORE_MAX_BYTES', 32 * 1024 * 1024))
+
+
+class StoredResponse:
+    """A 200 response kept for reuse; quacks like requests.Response for readers."""
+
+    status_code = 200
+    ok = True
+
+    def __init__(self, content, headers, etag=None, last_modified=None, stored_at=None):
+        self.content = content
+        self.headers = headers
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at or time.time()   # when the server last confirmed it
+        self.version = hashlib.sha1(content).hexdigest()
+        self._parsed = None
+        self._parsed_lock = threading.Lock()
+
+    @classmethod
+    def from_response(cls, response):
+        headers = {k: v for k, v in response.headers.items()
+                   if k.lower() in ('content-type', 'etag', 'last-modified')}
+        return cls(response.content, headers, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    def json(self):
+        # Parsed once, on first use
+        if self._parsed is None:
+            with self._parsed_lock:
+                if self._parsed is None:
+                    self._parsed = json.loads(self.content)
+        return self._parsed
+
+    def conditional_headers(self):
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def adopt(self, previous):
+        """Reuse `previous`'s parsed body if the content is byte-identical."""
+        if previous is not None and previous.version == self.version:
+            self._parsed = previous._parsed
+
+
+class ResponseStore:
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # (user, path) -> StoredResponse
+        self._dirty = set()             # (user, path) changed by a mutation since stored
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.revalidated = 0            # 304s answered from the store
+        self.unchanged = 0              # 200s whose content hash matched
+
+    def get(self, user, path, owner=None):
+        """Stored body for `path`, loaded from disk for `owner` if not in memory."""
+        with self._lock:
+            stored = self._entries.get((user, path))
+            if stored is not None:
+                self._entries.move_to_end((user, path))
+                return stored
+        if owner is None or disk is None:
+            return None
+        row = disk.get(owner, path)
+        if row is None:
+            return None
+        content, etag, last_modified, stored_at = row
+        stored = StoredResponse(content, {'Content-Type': 'application/json'}, etag, last_modified, stored_at)
+        with self._lock:
+            stored = self._entries.setdefault((user, path), stored)
+            if stored.content is content:
+                self._bytes += len(content)
+                self._evict()
+        return stored
+
+    def put(self, user, path, response, owner=None):
+        """Store a 200 response; returns the StoredResponse readers should use."""
+        stored = StoredResponse.from_response(response)
+        with self._lock:
+            previous = self._entries.pop((user, path), None)
+            if previous is not None:
+                self._bytes -= len(previous.content)
+                if previous.version == stored.version:
+                    self.unchanged += 1
+            stored.adopt(previous)
+            self._entries[(user, path)] = stored
+            self._dirty.discard((user, path))
+            self._bytes += len(stored.content)
+            self._evict()
+        if owner is not None and disk is not None:
+            disk.put(owner, path, stored.content, stored.etag, stored.last_modified, stored.stored_at)
+        return stored
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            key, evicted = self._entries.popitem(last=False)
+            self._dirty.discard(key)
+            self._bytes -= len(evicted.content)
+
+    def not_modified(self, user, path, stored, owner=None):
+        """The server answered 304 to a request revalidating `stored`."""
+        stored.stored_at = time.time()
+        with self._lock:
+            self.revalidated += 1
+            self._dirty.discard((user, path))
+        if owner is not None and disk is not None:
+            disk.touch(owner, path)
+        return stored
+
+    def invalidate(self, user, paths):
+        """Mark `paths` as changed by a mutation; they stay usable for revalidation."""
+        with self._lock:
+            self._dirty.update((user, path) for path in paths)
+
+    def is_dirty(self, user, path):
+        with self._lock:
+            return (user, path) in self._dirty
+
+    def clear_user(self, user):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == user]:
+                self._bytes -= len(self._entries.pop(key).content)
+            self._dirty = {key for key in self._dirty if key[0] != user}
+
+    def shared(self):
+        """Stored responses, which sessions share rather than own."""
+        with self._lock:
+            return list(self._entries.values())
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes,
+                    'revalidated': self.revalidated, 'unchanged': self.unchanged}
+
+
+responses = ResponseStore()
@@ -1,30 +1,672 @@
 # server.py
-# This file is needed to correctly serve the static PWA files on deployment.
+# Front server for deployment: serves the static PWA files and reverse-proxies
+# everything else (including Streamlit's WebSocket stream) to a pool of
+# supervised Streamlit worker processes on internal ports. Each browser is
+# pinned to one worker (cookie, with a hash fallback) so st.session_state
+# keeps working. Send SIGHUP for a rolling restart of the workers.
+# GET /metrics returns Prometheus text for the front server and all workers.
+#
+# PWA: the app page gets the manifest link and service worker registration
+# injected on its way through the proxy. The service worker is served with
+# its precache manifest (the PWA files plus the Streamlit bundles the page
+# loads) and a version derived from it filled in. Hashed Streamlit bundles
+# and ?v=<revision> URLs of the PWA files are served as immutable.
 
-import subprocess
+import gzip
+import hashlib
+import http.client
+import importlib.util
+import json
+import mimetypes
 import os
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+import re
+import select
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+import metrics
 
 # Define the host and port
 HOST = '0.0.0.0'
-PORT = 8000
+PORT = int(os.environ.get('PORT', 8000))
+STREAMLIT_HOST = '127.0.0.1'
+STREAMLIT_PORT = int(os.environ.get('CURA_STREAMLIT_PORT', 8501))   # worker i listens on this + i
 
-class CustomHandler(SimpleHTTPRequestHandler):
-    def __init__(self, *args, **kwargs):
-        # Serve files from the 'static' directory
-        super().__init__(*args, directory='static', **kwargs)
+# Worker pool; by default one per CPU this process may run on (affinity and
+# cpusets; os.cpu_count() counts the whole host's)
+_CPUS = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+WORKERS = int(os.environ.get('CURA_WORKERS') or _CPUS or 1)
+HEALTH_INTERVAL = float(os.environ.get('CURA_HEALTH_INTERVAL', 5))
+HEALTH_FAILURES = 3         # consecutive failed checks before a live worker is restarted
+STARTUP_GRACE = 60          # seconds a new worker gets to become healthy
+DRAIN_TIMEOUT = float(os.environ.get('CURA_DRAIN_TIMEOUT', 300))
+WORKER_COOKIE = 'cura_worker'
 
-def run_streamlit():
-    # Command to run the Streamlit app
-    # Make sure 'app.py' is the name of your main Streamlit file
-    command = "streamlit run app.py --server.port {}".format(PORT)
-    subprocess.Popen(command, shell=True)
+# Workers write metric snapshots here; /metrics merges them
+METRICS_DIR = os.environ.get('CURA_METRICS_DIR') or os.path.join(tempfile.gettempdir(), f"cura-metrics-{PORT}")
+METRICS_PATH = '/metrics'
+METRICS_TOKEN = os.environ.get('CURA_METRICS_TOKEN')   # if set, scrapers must send it as a Bearer token
 
-if __name__ == '__main__':
-    # Start the Streamlit app in a separate process
-    run_streamlit()
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(APP_DIR, 'static')
+STATIC_PREFIX = '/app/static/'   # where app.py links the PWA files from
+
+# The service worker must be revalidated on every load so updates roll out;
+# the other assets are cheap to revalidate thanks to their ETags.
+CACHE_CONTROL = {
+    'service-worker.js': 'no-cache',
+}
+DEFAULT_CACHE_CONTROL = 'public, max-age=3600'
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+SERVICE_WORKER = 'service-worker.js'
+
+# Streamlit's bundles carry a content hash in their names (index.CKCTizkM.js)
+HASHED_ASSET = re.compile(r'^/static/(js|css|media)/[^/]+\.[A-Za-z0-9_-]{8}\.[a-z0-9]+$')
+
+# Added to the <head> of the app page
+PWA_HEAD = (
+    f'<link rel="manifest" href="{STATIC_PREFIX}manifest.json">'
+    '<meta name="theme-color" content="#4A90E2">'
+    f'<link rel="apple-touch-icon" href="{STATIC_PREFIX}icon-192.png">'
+    "<script>if ('serviceWorker' in navigator) { window.addEventListener('load', function () {"
+    f" navigator.serviceWorker.register('{STATIC_PREFIX}{SERVICE_WORKER}', {{scope: '/'}})"
+    ".catch(function (err) { console.log('ServiceWorker registration failed: ', err); }); }); }</script>"
+).encode()
+
+# Headers that describe a single connection and must not be forwarded
+HOP_BY_HOP = {'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+              'te', 'trailers', 'transfer-encoding', 'upgrade'}
+# Written by send_response() itself; forwarding the worker's would duplicate them
+OWN_HEADERS = {'server', 'date'}
+# Methods that are safe to resend if the upstream connection dropped mid-request
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'}
+CHUNK_SIZE = 64 * 1024
+MAX_LINE = 64 * 1024        # longest chunk-size or trailer line accepted in a request body
+
+
+# --- STATIC ASSETS ---
+class StaticAsset:
+    """A static file held in memory with its ETag and compressed variants."""
+
+    def __init__(self, name, body):
+        self.name = name
+        self.content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        if self.content_type.startswith('text/') or self.content_type.endswith(('json', 'javascript')):
+            self.content_type += '; charset=utf-8'
+        self.cache_control = CACHE_CONTROL.get(name, DEFAULT_CACHE_CONTROL)
+        digest = self.digest = hashlib.sha256(body).hexdigest()[:32]
+        # Each encoding is a different representation, so gets its own ETag
+        self.variants = {'identity': (body, f'"{digest}"')}
+        self.variants['gzip'] = (gzip.compress(body, 9, mtime=0), f'"{digest}-gz"')
+        if brotli is not None:
+            self.variants['br'] = (brotli.compress(body), f'"{digest}-br"')
+
+    def negotiate(self, accept_encoding):
+        accepted = {token.split(';')[0].strip() for token in (accept_encoding or '').split(',')}
+        for encoding in ('br', 'gzip'):
+            if encoding in self.variants and encoding in accepted:
+                if len(self.variants[encoding][0]) < len(self.variants['identity'][0]):
+                    return encoding
+        return 'identity'
+
+
+def load_static_assets(directory=STATIC_DIR):
+    assets = {}
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            with open(path, 'rb') as f:
+                assets[name] = StaticAsset(name, f.read())
+    if SERVICE_WORKER in assets:
+        manifest = precache_manifest(assets)
+        body = render_service_worker(assets[SERVICE_WORKER].variants['identity'][0], manifest)
+        assets[SERVICE_WORKER] = StaticAsset(SERVICE_WORKER, body)
+    return assets
+
+
+def precache_manifest(assets):
+    """[{url, revision}] for the service worker to fetch at install.
+
+    PWA files carry their content digest as revision; Streamlit's bundles
+    need none since their names are already hashed.
+    """
+    entries = [{'url': f"{STATIC_PREFIX}{name}", 'revision': asset.digest}
+               for name, asset in assets.items() if name != SERVICE_WORKER]
+    entries += [{'url': url, 'revision': None} for url in streamlit_shell_urls()]
+    return entries
+
+
+def streamlit_shell_urls():
+    """Hashed bundles Streamlit's index.html loads up front (scripts, styles, fonts)."""
+    spec = importlib.util.find_spec('streamlit')
+    if spec is None or not spec.submodule_search_locations:
+        return []
+    try:
+        with open(os.path.join(spec.submodule_search_locations[0], 'static', 'index.html'), encoding='utf-8') as f:
+            html = f.read()
+    except OSError:
+        return []
+    urls = ('/' + path.lstrip('./') for path in re.findall(r'(?:src|href)="(\./static/[^"]+)"', html))
+    return sorted({url for url in urls if HASHED_ASSET.match(url)})
+
+
+def render_service_worker(source, manifest):
+    """Fill the precache manifest and its version into the service worker source."""
+    manifest_json = json.dumps(manifest, separators=(',', ':'))
+    version = hashlib.sha256(manifest_json.encode()).hexdigest()[:12]
+    source = source.decode()
+    source = re.sub(r'^const PRECACHE_MANIFEST = \[\];', f'const PRECACHE_MANIFEST = {manifest_json};',
+                    source, count=1, flags=re.M)
+    source = re.sub(r"^const PRECACHE_VERSION = 'dev';", f"const PRECACHE_VERSION = '{version}';",
+                    source, count=1, flags=re.M)
+    return source.encode()
+
+
+def inject_pwa_head(html):
+    # Before </head>, or not at all if the page has none
+    index = html.find(b'</head>')
+    if index < 0:
+        return html
+    return html[:index] + PWA_HEAD + html[index:]
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return etag in tags or f'W/{etag}' in tags
+
+
+# --- STREAMLIT WORKERS ---
+class StreamlitWorker:
+    """One Streamlit process serving app.py on its own internal port."""
+
+    def __init__(self, index, port):
+        self.index = index
+        self.port = port
+        self.process = None
+        self.healthy = False
+        self.draining = False
+        self.failures = 0          # consecutive failed health checks
+        self.connections = 0       # open WebSocket sessions
+        self.backoff = 1
+        self.started_at = 0
+        self.restart_at = None
+        self._lock = threading.Lock()
+
+    def command(self):
+        return [sys.executable, '-m', 'streamlit', 'run', os.path.join(APP_DIR, 'app.py'),
+                '--server.port', str(self.port), '--server.address', STREAMLIT_HOST,
+                '--server.headless', 'true']
+
+    def start(self):
+        self.healthy = False
+        self.failures = 0
+        self.restart_at = None
+        self.started_at = time.monotonic()
+        self.process = subprocess.Popen(self.command(), cwd=APP_DIR,
+                                        env={**os.environ, 'CURA_METRICS_DIR': METRICS_DIR})
+        metrics.registry.inc('cura_worker_starts_total', worker=str(self.index))
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def check_health(self):
+        conn = http.client.HTTPConnection(STREAMLIT_HOST, self.port, timeout=2)
+        try:
+            conn.request('GET', '/_stcore/health')
+            return conn.getresponse().status == 200
+        except (http.client.HTTPException, OSError):
+            return False
+        finally:
+            conn.close()
+
+    def track_connection(self, delta):
+        with self._lock:
+            self.connections += delta
+
+    def stop(self, timeout=10):
+        self.healthy = False
+        if self.alive():
+            self.process.terminate()
+            try:
+                self.process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+class WorkerPool:
+    """Starts N workers, health-checks them, restarts failed ones and routes
+    each browser to a consistent worker so its session state survives."""
+
+    def __init__(self, count=WORKERS, base_port=STREAMLIT_PORT):
+        self.workers = [StreamlitWorker(i, base_port + i) for i in range(count)]
+        self._stopping = threading.Event()
+        self._rolling = threading.Lock()
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+        threading.Thread(target=self._supervise, name='worker-supervisor', daemon=True).start()
 
-    # Start the simple HTTP server to serve the static files
-    httpd = HTTPServer((HOST, PORT), CustomHandler)
-    print(f"Serving static files from /static at http://{HOST}:{PORT}")
-    httpd.serve_forever()
+    def _supervise(self):
+        while not self._stopping.wait(HEALTH_INTERVAL):
+            for worker in self.workers:
+                if worker.draining or self._stopping.is_set():
+                    continue
+                if not worker.alive():
+                    self._restart_crashed(worker)
+                elif worker.check_health():
+                    worker.healthy = True
+                    worker.failures = 0
+                    if time.monotonic() - worker.started_at > 60:
+                        worker.backoff = 1
+                elif time.monotonic() - worker.started_at > STARTUP_GRACE:
+                    worker.healthy = False
+                    worker.failures += 1
+                    if worker.failures >= HEALTH_FAILURES:
+                        print(f"Worker {worker.index} is unresponsive; restarting", flush=True)
+                        worker.stop()
+                        worker.start()
+
+    def _restart_crashed(self, worker):
+        worker.healthy = False
+        now = time.monotonic()
+        if worker.restart_at is None:
+            print(f"Worker {worker.index} exited with code {worker.process.returncode}; "
+                  f"restarting in {worker.backoff}s", flush=True)
+            worker.restart_at = now + worker.backoff
+            worker.backoff = min(worker.backoff * 2, 30)
+        elif now >= worker.restart_at:
+            worker.start()
+
+    def route(self, pinned, client_key, reconnect=False):
+        """Pick the worker for a request; returns (worker, newly_assigned)."""
+        if pinned is not None and 0 <= pinned < len(self.workers):
+            worker = self.workers[pinned]
+            # A draining worker keeps its live sessions (WebSocket
+            # reconnects) but takes no new ones (page loads)
+            if worker.healthy and (reconnect or not worker.draining):
+                return worker, False
+        candidates = [w for w in self.workers if w.healthy and not w.draining] \
+            or [w for w in self.workers if w.alive() and not w.draining]
+        if not candidates:
+            return None, False
+        # Rendezvous hashing keeps a browser on the same worker even if it
+        # drops the cookie, and only moves 1/N of browsers when N changes
+        worker = max(candidates, key=lambda w: hashlib.sha1(f"{client_key}|{w.index}".encode()).digest())
+        return worker, True
+
+    def rolling_restart(self):
+        """Drain and restart workers one at a time without dropping the others' users."""
+        if not self._rolling.acquire(blocking=False):
+            return
+        try:
+            for worker in self.workers:
+                if self._stopping.is_set():
+                    break
+                worker.draining = True
+                deadline = time.monotonic() + DRAIN_TIMEOUT
+                while worker.connections and time.monotonic() < deadline and not self._stopping.is_set():
+                    time.sleep(1)
+                worker.stop()
+                worker.start()
+                deadline = time.monotonic() + STARTUP_GRACE
+                while time.monotonic() < deadline:
+                    if worker.check_health():
+                        worker.healthy = True
+                        break
+                    time.sleep(1)
+                worker.draining = False
+        finally:
+            self._rolling.release()
+
+    def stop(self):
+        self._stopping.set()
+        for worker in self.workers:
+            worker.stop()
+
+
+metrics.registry.counter('cura_front_requests_total', "Requests handled by the front server by route and status.")
+metrics.registry.histogram('cura_front_proxy_seconds', "Time to proxy one HTTP request to a worker.")
+metrics.registry.counter('cura_front_websockets_total', "WebSocket sessions opened by worker.")
+metrics.registry.counter('cura_worker_starts_total', "Worker process starts, including restarts.")
+metrics.registry.gauge('cura_worker_up', "Whether the worker passes its health check.")
+metrics.registry.gauge('cura_worker_draining', "Whether the worker is draining for a restart.")
+metrics.registry.gauge('cura_worker_websockets', "Open WebSocket sessions per worker.")
+
+
+# --- REQUEST HANDLER ---
+class BadFraming(Exception):
+    """A request body the proxy can't delimit; answered with `status`."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class FrontHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'CURA'
+    assets = {}
+    pool = None
+    _upstream = threading.local()
+
+    def do_GET(self):
+        if self.path.startswith(STATIC_PREFIX):
+            self.serve_static()
+        elif self.path.split('?', 1)[0] == METRICS_PATH:
+            self.serve_metrics()
+        elif self.headers.get('Upgrade', '').lower() == 'websocket':
+            self.proxy_websocket()
+        else:
+            self.proxy()
+
+    def do_HEAD(self):
+        if self.path.startswith(STATIC_PREFIX):
+            self.serve_static()
+        else:
+            self.proxy()
+
+    # --- Static files ---
+    def serve_static(self):
+        name, _, query = self.path[len(STATIC_PREFIX):].partition('?')
+        asset = self.assets.get(name)
+        if asset is None:
+            metrics.registry.inc('cura_front_requests_total', route='static', status='404')
+            self.send_error(404)
+            return
+        encoding = asset.negotiate(self.headers.get('Accept-Encoding'))
+        body, etag = asset.variants[encoding]
+        matched = etag_matches(self.headers.get('If-None-Match'), etag)
+        metrics.registry.inc('cura_front_requests_total', route='static', status='304' if matched else '200')
+        self.send_response(304 if matched else 200)
+        self.send_header('ETag', etag)
+        # The service worker fetches ?v=<digest> URLs, which never change
+        versioned = f"v={asset.digest}" in query.split('&')
+        self.send_header('Cache-Control', IMMUTABLE_CACHE_CONTROL if versioned else asset.cache_control)
+        self.send_header('Vary', 'Accept-Encoding')
+        if name == SERVICE_WORKER:
+            # Served from /app/static/ but controls the whole app
+            self.send_header('Service-Worker-Allowed', '/')
+        if matched:
+            self.end_headers()
+            return
+        self.send_header('Content-Type', asset.content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if encoding != 'identity':
+            self.send_header('Content-Encoding', encoding)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    # --- Metrics ---
+    def serve_metrics(self):
+        if METRICS_TOKEN and self.headers.get('Authorization') != f"Bearer {METRICS_TOKEN}":
+            self.send_error(401)
+            return
+        for worker in self.pool.workers:
+            labels = {'worker': str(worker.index)}
+            metrics.registry.set('cura_worker_up', int(worker.healthy), **labels)
+            metrics.registry.set('cura_worker_draining', int(worker.draining), **labels)
+            metrics.registry.set('cura_worker_websockets', worker.connections, **labels)
+        snapshots = [metrics.registry.snapshot()] + metrics.read_snapshots(METRICS_DIR)
+        body = metrics.render(snapshots).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+
+    # --- Reverse proxy ---
+    def _pick_worker(self, reconnect=False):
+        cookie = SimpleCookie(self.headers.get('Cookie', ''))
+        try:
+            pinned = int(cookie[WORKER_COOKIE].value)
+        except (KeyError, ValueError):
+            pinned = None
+        client = self.headers.get('X-Forwarded-For', self.client_address[0]).split(',')[0].strip()
+        return self.pool.route(pinned, f"{client}|{self.headers.get('User-Agent', '')}", reconnect)
+
+    def _read_body(self):
+        # The request body (None if there is none), read off the client
+        # connection exactly as framed so the next request starts after it
+        encoding = self.headers.get('Transfer-Encoding')
+        length = self.headers.get('Content-Length')
+        if encoding is not None:
+            if length is not None:
+                raise BadFraming(400, "Content-Length and Transfer-Encoding are mutually exclusive")
+            if encoding.strip().lower() != 'chunked':
+                raise BadFraming(501, f"Unsupported Transfer-Encoding: {encoding}")
+            return self._read_chunked()
+        if length is None:
+            return None
+        if not length.strip().isdigit():
+            raise BadFraming(400, "Invalid Content-Length")
+        length = int(length)
+        return self.rfile.read(length) if length else None
+
+    def _read_chunked(self):
+        parts = []
+        while True:
+            line = self.rfile.readline(MAX_LINE + 1)
+            size = line.split(b';', 1)[0].strip()
+            if len(line) > MAX_LINE or not line.endswith(b'\n') or not size \
+                    or size.strip(b'0123456789abcdefABCDEF'):
+                raise BadFraming(400, "Malformed chunked body")
+            size = int(size, 16)
+            if size == 0:
+                break
+            data = self.rfile.read(size)
+            if len(data) < size or self.rfile.readline(MAX_LINE + 1) not in (b'\r\n', b'\n'):
+                raise BadFraming(400, "Malformed chunked body")
+            parts.append(data)
+        # Trailers are dropped, like the other hop-by-hop headers
+        while True:
+            line = self.rfile.readline(MAX_LINE + 1)
+            if len(line) > MAX_LINE or not line.endswith(b'\n'):
+                raise BadFraming(400, "Malformed chunked body")
+            if line in (b'\r\n', b'\n'):
+                return b''.join(parts)
+
+    def _forward_headers(self):
+        headers = {k: v for k, v in self.headers.items() if k.lower() not in HOP_BY_HOP}
+        headers['X-Forwarded-For'] = self.client_address[0]
+        headers['X-Forwarded-Proto'] = self.headers.get('X-Forwarded-Proto', 'http')
+        return headers
+
+    def _upstream_connection(self, port, fresh=False):
+        # One kept-alive connection per worker per handler thread
+        if not hasattr(self._upstream, 'conns'):
+            self._upstream.conns = {}
+        conns = self._upstream.conns
+        conn = conns.get(port)
+        if conn is None or fresh:
+            if conn is not None:
+                conn.close()
+            conn = conns[port] = http.client.HTTPConnection(STREAMLIT_HOST, port, timeout=300)
+        return conn
+
+    def proxy(self):
+        started = time.perf_counter()
+        status = self._proxy()
+        metrics.registry.inc('cura_front_requests_total', route='proxy', status=str(status))
+        metrics.registry.observe('cura_front_proxy_seconds', time.perf_counter() - started)
+
+    def _proxy(self):
+        # Returns the status sent to the client
+        try:
+            body = self._read_body()
+        except BadFraming as exc:
+            # send_error() closes the connection: the rest of it can't be parsed
+            self.send_error(exc.status, exc.message)
+            return exc.status
+        worker, assigned = self._pick_worker()
+        if worker is None:
+            self.send_error(503, "CURA is starting up, please retry shortly")
+            return 503
+        headers = self._forward_headers()
+        if body is not None:
+            # A chunked body is forwarded decoded, with its length
+            headers['Content-Length'] = str(len(body))
+        path = self.path.split('?', 1)[0]
+        # App pages get the PWA tags; ask for them uncompressed to edit them
+        document = self.command == 'GET' and 'text/html' in self.headers.get('Accept', '') \
+            and not path.startswith('/_stcore/')
+        if document:
+            headers = {k: v for k, v in headers.items() if k.lower() != 'accept-encoding'}
+        for attempt in range(2):
+            conn = self._upstream_connection(worker.port, fresh=attempt > 0)
+            try:
+                conn.request(self.command, self.path, body=body, headers=headers)
+                response = conn.getresponse()
+                break
+            except ConnectionRefusedError:
+                self._upstream.conns.pop(worker.port, None)
+                self.send_error(503, "CURA is starting up, please retry shortly")
+                return 503
+            except (http.client.HTTPException, OSError):
+                # Kept-alive upstream connection went stale; retry once, but
+                # never resend a request the worker may already have acted on
+                self._upstream.conns.pop(worker.port, None)
+                if attempt or self.command not in IDEMPOTENT_METHODS:
+                    self.send_error(502)
+                    return 502
+
+        overrides = {}
+        body = None
+        if response.status == 200 and HASHED_ASSET.match(path):
+            overrides['cache-control'] = IMMUTABLE_CACHE_CONTROL
+        elif document and response.status == 200 and not response.getheader('Content-Encoding') \
+                and (response.getheader('Content-Type') or '').startswith('text/html'):
+            body = inject_pwa_head(response.read())
+            overrides['content-length'] = str(len(body))
+            overrides['cache-control'] = 'no-cache'
+
+        self.send_response(response.status, response.reason)
+        for key, value in response.getheaders():
+            if key.lower() not in HOP_BY_HOP | OWN_HEADERS and key.lower() not in overrides:
+                self.send_header(key, value)
+        for key, value in overrides.items():
+            self.send_header(key.title(), value)
+        if assigned:
+            self.send_header('Set-Cookie', f"{WORKER_COOKIE}={worker.index}; Path=/; HttpOnly; SameSite=Lax")
+        if body is not None:
+            self.end_headers()
+            self.wfile.write(body)
+            if response.will_close:
+                self._upstream.conns.pop(worker.port, None)
+            return response.status
+        chunked = response.getheader('Content-Length') is None and self.command != 'HEAD' \
+            and response.status not in (204, 304)
+        if chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        while True:
+            data = response.read1(CHUNK_SIZE) if chunked else response.read(CHUNK_SIZE)
+            if not data:
+                break
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data) if chunked else data)
+            if chunked:
+                self.wfile.flush()
+        if chunked:
+            self.wfile.write(b'0\r\n\r\n')
+        if response.will_close:
+            self._upstream.conns.pop(worker.port, None)
+        return response.status
+
+    do_POST = do_PUT = do_PATCH = do_DELETE = do_OPTIONS = proxy
+
+    def proxy_websocket(self):
+        worker, _ = self._pick_worker(reconnect=True)
+        try:
+            if worker is None:
+                raise ConnectionRefusedError
+            upstream = socket.create_connection((STREAMLIT_HOST, worker.port))
+        except OSError:
+            self.send_error(503, "CURA is starting up, please retry shortly")
+            return
+        worker.track_connection(1)
+        metrics.registry.inc('cura_front_websockets_total', worker=str(worker.index))
+        head = [f"{self.command} {self.path} HTTP/1.1"]
+        head += [f"{k}: {v}" for k, v in self.headers.items()]
+        head.append(f"X-Forwarded-For: {self.client_address[0]}")
+        upstream.sendall(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1'))
+        client = self.connection
+        try:
+            while True:
+                readable, _, _ = select.select([client, upstream], [], [], 300)
+                if not readable:
+                    continue
+                if client in readable:
+                    # read1 drains anything already buffered by rfile first
+                    data = self.rfile.read1(CHUNK_SIZE)
+                    if not data:
+                        break
+                    upstream.sendall(data)
+                if upstream in readable:
+                    data = upstream.recv(CHUNK_SIZE)
+                    if not data:
+                        break
+                    client.sendall(data)
+        except OSError:
+            pass
+        finally:
+            worker.track_connection(-1)
+            upstream.close()
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FrontServer(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def main():
+    FrontHandler.assets = load_static_assets()
+    pool = FrontHandler.pool = WorkerPool()
+    pool.start()
+
+    httpd = FrontServer((HOST, PORT), FrontHandler)
+
+    def shutdown(signum, frame):
+        # serve_forever() runs on this thread, so stop it from another one
+        threading.Thread(target=httpd.shutdown, daemon=True).start()
+
+    def rolling_restart(signum, frame):
+        threading.Thread(target=pool.rolling_restart, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGHUP, rolling_restart)
+
+    print(f"Serving CURA at http://{HOST}:{PORT} with {len(pool.workers)} Streamlit worker(s) "
+          f"on {STREAMLIT_HOST}:{STREAMLIT_PORT}+", flush=True)
+    try:
+        httpd.serve_forever()
+    finally:
+        httpd.server_close()
+        pool.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,58 +1,140 @@
-// A simple service worker for caching an offline page
+// Service worker for the CURA PWA.
+//
+// - Precache: at install, the app shell (Streamlit's page bundles, the PWA
+//   files and icons) is fetched into a cache named after PRECACHE_VERSION.
+//   server.py fills in PRECACHE_MANIFEST and PRECACHE_VERSION when it serves
+//   this file, so any change to the assets yields a new worker.
+// - Hashed assets (/static/js|css|media/name.<hash>.ext) never change under
+//   the same name: served cache-first, fetched once.
+// - Safe read-only endpoints (and the manifest, though precached): stale-
+//   while-revalidate, checked first so they are always refreshed.
+// - Navigations: network-first, falling back to the offline page.
+// - Activation deletes every CURA cache that is not current.
 
-const CACHE_NAME = 'cura-offline-cache-v1';
-const OFFLINE_URL = 'offline.html';
+const PRECACHE_MANIFEST = [];     // [{url, revision}], filled in by server.py
+const PRECACHE_VERSION = 'dev';   // filled in by server.py
+
+const PRECACHE = `cura-precache-${PRECACHE_VERSION}`;
+const ASSETS = 'cura-assets-v1';
+const RUNTIME = 'cura-runtime-v1';
+const CURRENT_CACHES = [PRECACHE, ASSETS, RUNTIME];
+const OFFLINE_URL = '/app/static/offline.html';
+const MAX_ASSETS = 300;
+
+const HASHED_ASSET = /^\/static\/(js|css|media)\/[^/]+\.[A-Za-z0-9_-]{8}\.[a-z0-9]+$/;
+// GET endpoints whose responses are safe to show slightly stale
+const STALE_WHILE_REVALIDATE = ['/_stcore/host-config', '/app/static/manifest.json'];
 
-// Install the service worker and cache the offline page
 self.addEventListener('install', (event) => {
   event.waitUntil(
-    caches.open(CACHE_NAME).then((cache) => {
-      return cache.add(OFFLINE_URL);
-    })
+    (async () => {
+      const cache = await caches.open(PRECACHE);
+      await Promise.all(
+        PRECACHE_MANIFEST.map(async (entry) => {
+          // ?v=<revision> is served as immutable, so the HTTP cache keeps it too
+          const source = entry.revision ? `${entry.url}?v=${entry.revision}` : entry.url;
+          const response = await fetch(source, { cache: 'no-cache' });
+          if (!response.ok) {
+            throw new Error(`Precaching ${entry.url} failed: ${response.status}`);
+          }
+          await cache.put(entry.url, response);
+        })
+      );
+      if (!PRECACHE_MANIFEST.some((entry) => entry.url === OFFLINE_URL)) {
+        await cache.add(OFFLINE_URL);
+      }
+    })()
   );
   self.skipWaiting();
 });
 
-// Clean up old caches on activation
 self.addEventListener('activate', (event) => {
   event.waitUntil(
-    caches.keys().then((cacheNames) => {
-      return Promise.all(
-        cacheNames.map((cacheName) => {
-          if (cacheName !== CACHE_NAME) {
-            return caches.delete(cacheName);
-          }
-        })
+    (async () => {
+      if (self.registration.navigationPreload) {
+        await self.registration.navigationPreload.enable();
+      }
+      const names = await caches.keys();
+      await Promise.all(
+        names
+          .filter((name) => name.startsWith('cura-') && !CURRENT_CACHES.includes(name))
+          .map((name) => caches.delete(name))
       );
-    })
+      await self.clients.claim();
+    })()
   );
-  self.clients.claim();
 });
 
-// Intercept fetch requests
 self.addEventListener('fetch', (event) => {
-  if (event.request.mode === 'navigate') {
-    event.respondWith(
-      (async () => {
-        try {
-          // First, try to use the navigation preload response if it's supported.
-          const preloadResponse = await event.preloadResponse;
-          if (preloadResponse) {
-            return preloadResponse;
-          }
+  const request = event.request;
+  if (request.method !== 'GET') {
+    return;
+  }
+  const url = new URL(request.url);
+  if (url.origin !== self.location.origin) {
+    return;
+  }
 
-          // Always try the network first.
-          const networkResponse = await fetch(event.request);
-          return networkResponse;
-        } catch (error) {
-          // Catch is only triggered if the network fails.
-          console.log('Fetch failed; returning offline page instead.', error);
-
-          const cache = await caches.open(CACHE_NAME);
-          const cachedResponse = await cache.match(OFFLINE_URL);
-          return cachedResponse;
-        }
-      })()
-    );
+  if (request.mode === 'navigate') {
+    event.respondWith(networkFirst(event));
+  } else if (STALE_WHILE_REVALIDATE.includes(url.pathname)) {
+    event.respondWith(staleWhileRevalidate(event, url.pathname));
+  } else if (HASHED_ASSET.test(url.pathname) || isPrecached(url.pathname)) {
+    event.respondWith(cacheFirst(request, url.pathname));
   }
 });
+
+function isPrecached(pathname) {
+  return PRECACHE_MANIFEST.some((entry) => entry.url === pathname);
+}
+
+async function networkFirst(event) {
+  try {
+    const preloadResponse = await event.preloadResponse;
+    if (preloadResponse) {
+      return preloadResponse;
+    }
+    return await fetch(event.request);
+  } catch (error) {
+    // Only reached when the network fails
+    const cache = await caches.open(PRECACHE);
+    return cache.match(OFFLINE_URL);
+  }
+}
+
+async function cacheFirst(request, pathname) {
+  const cached = await caches.match(pathname, { ignoreSearch: true });
+  if (cached) {
+    return cached;
+  }
+  const response = await fetch(request);
+  if (response.ok && HASHED_ASSET.test(pathname)) {
+    const cache = await caches.open(ASSETS);
+    await cache.put(pathname, response.clone());
+    trimCache(cache, MAX_ASSETS);
+  }
+  return response;
+}
+
+async function staleWhileRevalidate(event, pathname) {
+  const cache = await caches.open(RUNTIME);
+  // Until the first refresh lands, a precached copy serves as the stale one
+  const cached = (await cache.match(event.request)) || (await caches.match(pathname, { ignoreSearch: true }));
+  const refresh = fetch(event.request).then(async (response) => {
+    if (response.ok) {
+      await cache.put(event.request, response.clone());
+    }
+    return response;
+  });
+  if (cached) {
+    event.waitUntil(refresh.catch(() => undefined));
+    return cached;
+  }
+  return refresh;
+}
+
+async function trimCache(cache, maxEntries) {
+  const keys = await cache.keys();
+  // Oldest entries first (insertion order)
+  await Promise.all(keys.slice(0, Math.max(0, keys.length - maxEntries)).map((key) => cache.delete(key)));
+}
@@ -0,0 +1,52 @@
+# conftest.py
+# The frontend modules import each other as top-level modules (the way
+# `streamlit run app.py` loads them), so put the frontend directory on the
+# path. Tests never touch the shared on-disk cache.
+
+import itertools
+import os
+import sys
+
+import pytest
+
+os.environ.setdefault('CURA_DISK_CACHE', '')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_client  # noqa: E402
+import mock_backend  # noqa: E402
+import mutation_batch  # noqa: E402
+from liveness import Liveness  # noqa: E402
+
+_users = itertools.count(1)
+
+
+@pytest.fixture
+def logged_in_client(monkeypatch):
+    """Factory: start mock_backend with a config, sign up and log in.
+
+    Returns (server, client). The API client, its liveness tracker and the
+    batch-endpoint detection all point at (and start fresh against) that
+    server; everything is stopped and restored afterwards.
+    """
+    servers, sessions = [], []
+
+    def start(config):
+        server = mock_backend.start(config=config)
+        servers.append(server)
+        monkeypatch.setattr(api_client, 'BASE_URL', server.base_url)
+        monkeypatch.setattr(api_client, 'backend', Liveness(lambda: server.base_url))
+        monkeypatch.setattr(mutation_batch, '_batch_supported', None)
+        anonymous = api_client.ApiClient()
+        email = f"test-{next(_users)}@example.com"
+        anonymous.post('/auth/signup/', json={'username': 'test', 'email': email, 'password': 'secret'})
+        sessionid = anonymous.post('/auth/login/', json={'email': email, 'password': 'secret'}).cookies.get('sessionid')
+        anonymous.close()
+        sessions.append(sessionid)
+        return server, api_client.get_client(sessionid)
+
+    yield start
+    for sessionid in sessions:
+        api_client.release_client(sessionid)
+    for server in servers:
+        server.shutdown()
+        server.server_close()
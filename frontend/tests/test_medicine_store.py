@@ -0,0 +1,61 @@
+# test_medicine_store.py
+# Optimistic mutations against mock_backend without a batch endpoint, where
+# every operation is its own request.
+
+import time
+
+import medicine_store
+import mock_backend
+import mutation_batch
+
+
+def settled(store, timeout=10):
+    deadline = time.monotonic() + timeout
+    while store.has_pending() and time.monotonic() < deadline:
+        store.settle()
+        time.sleep(0.01)
+    return store
+
+
+def test_mutations_from_separate_clicks_keep_their_order(logged_in_client, monkeypatch):
+    _, client = logged_in_client(mock_backend.MockConfig(seed_medicines=2, batch=False))
+    send_one = mutation_batch._send_one
+
+    def slow_take(api, op):
+        # Without ordering the Delete below would overtake this Take
+        if op.path.endswith('/take/'):
+            time.sleep(0.3)
+        return send_one(api, op)
+    monkeypatch.setattr(mutation_batch, '_send_one', slow_take)
+
+    store = medicine_store.MedicineStore()
+    store.load(client.get('/reminder/medicines/', fresh=True).json())
+    med_id, med = next(iter(store.medicines.items()))
+    store.take_dose(client, med_id, med['reminders'][0]['id'])
+    store.delete_medicine(client, med_id)
+
+    settled(store)
+    assert store.errors == {}
+    assert med_id not in store.medicines
+    assert len(store.medicines) == 1
+
+
+def test_list_loaded_while_a_take_settles_counts_it_once(logged_in_client):
+    _, client = logged_in_client(mock_backend.MockConfig(seed_medicines=2))
+    store = medicine_store.MedicineStore()
+    response = client.get('/reminder/medicines/', fresh=True)
+    store.load(response.json(), response.version)
+    med_id, med = next(iter(store.medicines.items()))
+    reminder = med['reminders'][0]
+    store.take_dose(client, med_id, reminder['id'])
+    expected = med['inventory'] - reminder['quantity']
+    assert store.medicines[med_id]['inventory'] == expected
+
+    # The take has landed but its job has not been settled yet
+    store.pending[0].job.job.wait()
+    response = client.get('/reminder/medicines/', fresh=True)
+    store.load(response.json(), response.version)
+    assert store.medicines[med_id]['inventory'] == expected
+
+    settled(store)
+    assert store.medicines[med_id]['inventory'] == expected
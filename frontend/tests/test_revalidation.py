@@ -0,0 +1,44 @@
+# test_revalidation.py
+# Conditional GETs against mock_backend: 304s and unchanged 200s reuse the
+# stored body and its parsed object; changed bodies get a new version.
+
+import pytest
+
+import mock_backend
+
+PATH = '/reminder/medicines/'
+
+
+@pytest.mark.parametrize('validators', ['etag', 'last-modified'])
+def test_not_modified_reuses_stored_response(logged_in_client, validators):
+    backend, client = logged_in_client(mock_backend.MockConfig(validators=validators, seed_medicines=2))
+    first = client.get(PATH, fresh=True)
+    parsed = first.json()
+    second = client.get(PATH, fresh=True)
+    assert backend.state.not_modified == 1
+    assert second is first
+    assert second.json() is parsed
+
+
+@pytest.mark.parametrize('validators', ['none'])
+def test_identical_body_without_validators_reuses_parsed_body(logged_in_client, validators):
+    backend, client = logged_in_client(mock_backend.MockConfig(validators=validators, seed_medicines=2))
+    first = client.get(PATH, fresh=True)
+    parsed = first.json()
+    second = client.get(PATH, fresh=True)
+    assert backend.state.not_modified == 0
+    assert second.version == first.version
+    assert second.json() is parsed
+
+
+@pytest.mark.parametrize('validators', ['etag', 'last-modified', 'none'])
+def test_changed_body_gets_new_version(logged_in_client, validators):
+    backend, client = logged_in_client(mock_backend.MockConfig(validators=validators, seed_medicines=2))
+    first = client.get(PATH, fresh=True)
+    parsed = first.json()
+    response = client.post(PATH, json={'name': 'Added', 'dosage': '5mg', 'inventory': 10})
+    assert response.status_code == 201
+    second = client.get(PATH, fresh=True)
+    assert second.version != first.version
+    assert second.json() is not parsed
+    assert len(second.json()) == len(parsed) + 1